@@ -1,8 +1,12 @@
 from parrot_rcc.errors import ElementInstanceNotFoundError
 from pyzeebe.errors import InvalidJSONError
+from pyzeebe.errors import JobAlreadyDeactivatedError
+from pyzeebe.errors import JobNotFoundError
 from pyzeebe.grpc_internals.grpc_utils import is_error_status
 from pyzeebe.grpc_internals.zeebe_adapter_base import ZeebeAdapterBase
 from typing import Dict
+from zeebe_grpc.gateway_pb2 import FailJobRequest
+from zeebe_grpc.gateway_pb2 import FailJobResponse
 from zeebe_grpc.gateway_pb2 import SetVariablesRequest
 from zeebe_grpc.gateway_pb2 import SetVariablesResponse
 from zeebe_grpc.gateway_pb2 import TopologyRequest
@@ -20,6 +24,27 @@ class ZeebeTopologyAdapter(ZeebeAdapterBase):
         return await self._gateway_stub.Topology(TopologyRequest)
 
 
+class ZeebeRetryAdapter(ZeebeAdapterBase):
+    async def fail_job(
+        self, job_key: int, retries: int, message: str, retry_back_off: int = 0
+    ) -> FailJobResponse:
+        try:
+            return await self._gateway_stub.FailJob(
+                FailJobRequest(
+                    jobKey=job_key,
+                    retries=retries,
+                    errorMessage=message,
+                    retryBackOff=retry_back_off,
+                )
+            )
+        except grpc.aio.AioRpcError as grpc_error:
+            if is_error_status(grpc_error, grpc.StatusCode.NOT_FOUND):
+                raise JobNotFoundError(job_key=job_key) from grpc_error
+            elif is_error_status(grpc_error, grpc.StatusCode.FAILED_PRECONDITION):
+                raise JobAlreadyDeactivatedError(job_key=job_key) from grpc_error
+            await self._handle_grpc_error(grpc_error)
+
+
 class ZeebeVariablesAdapter(ZeebeAdapterBase):
     async def set_variables(
         self, element_instance_key: int, variables: Dict, local: bool
@@ -0,0 +1,171 @@
+from contextlib import asynccontextmanager
+from parrot_rcc.metrics import metrics
+from parrot_rcc.usage import TaskUsage
+from pathlib import Path
+from typing import AsyncIterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a started job is expected to take to reach its peak memory usage
+RAMP_UP = 30
+
+metrics.describe("parrot_rcc_slots_used", "gauge", "Jobs holding an execution slot.")
+metrics.describe(
+    "parrot_rcc_admission_waits_total",
+    "counter",
+    "Times a job waited for resources, by the resource below its watermark.",
+)
+
+
+def read_int(path: str) -> Optional[int]:
+    try:
+        return int(Path(path).read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def memory_available() -> Optional[int]:
+    """Return bytes available for new processes on the host or in the cgroup."""
+    available = []
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                available.append(int(line.split()[1]) * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    for limit_path, usage_path in [
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+        (
+            "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+            "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+        ),
+    ]:
+        limit, usage = read_int(limit_path), read_int(usage_path)
+        if limit is not None and usage is not None:
+            available.append(max(0, limit - usage))
+    return min(available) if available else None
+
+
+def load_per_cpu() -> Optional[float]:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return None
+
+
+def disk_free(path: str) -> Optional[int]:
+    # Work root may not have been created yet
+    existing = Path(path)
+    while not existing.exists() and existing != existing.parent:
+        existing = existing.parent
+    try:
+        return shutil.disk_usage(existing).free
+    except OSError:
+        return None
+
+
+class Slots:
+    """Execution slots for jobs, admitted by available resources.
+
+    At most size jobs run at once. While any job is running, a new job is
+    started only when available memory, load average per CPU and free disk
+    of the work root are within their watermarks. With task usage, memory
+    is also reserved for the peak RSS previously recorded for the task.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        work_root: str = "",
+        min_memory_mb: int = 0,
+        max_load: float = 0,
+        min_disk_mb: int = 0,
+        usage: Optional[TaskUsage] = None,
+        interval: float = 1,
+    ):
+        self.size = size
+        self.work_root = work_root or tempfile.gettempdir()
+        self.min_memory = min_memory_mb * 1024 * 1024
+        self.max_load = max_load
+        self.min_disk = min_disk_mb * 1024 * 1024
+        self.usage = usage
+        self.interval = interval
+        self.used: Set[int] = set()
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+        self._recent: List[Tuple[float, int]] = []
+
+    @property
+    def free(self) -> int:
+        return self.size - len(self.used)
+
+    def blocked(self, task: str) -> Optional[str]:
+        """Return the resource preventing the task from being started."""
+        if not self.used:
+            return None
+        if self.min_memory or self.usage is not None:
+            now = time.monotonic()
+            self._recent = [(t, rss) for t, rss in self._recent if now - t < RAMP_UP]
+            required = self.min_memory + sum(rss for t, rss in self._recent)
+            if self.usage is not None:
+                required += self.usage.peak_rss(task)
+            available = memory_available()
+            if available is not None and available < required:
+                return "memory"
+        if self.max_load:
+            load = load_per_cpu()
+            if load is not None and load > self.max_load:
+                return "load"
+        if self.min_disk:
+            free = disk_free(self.work_root)
+            if free is not None and free < self.min_disk:
+                return "disk"
+        return None
+
+    @asynccontextmanager
+    async def acquire(self, task: str = "") -> AsyncIterator[int]:
+        """Wait for a slot and yield its index from 1 to size."""
+        self.waiting += 1
+        try:
+            async with self._condition:
+                reason = None
+                while True:
+                    if self.free > 0:
+                        blocked = self.blocked(task)
+                        if blocked is None:
+                            break
+                        if blocked != reason:
+                            logger.debug("Task %s is waiting for %s", task, blocked)
+                            metrics.inc(
+                                "parrot_rcc_admission_waits_total", reason=blocked
+                            )
+                        reason = blocked
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), self.interval)
+                    except asyncio.TimeoutError:
+                        pass
+                idx = min(set(range(1, self.size + 1)) - self.used)
+                self.used.add(idx)
+                if self.usage is not None:
+                    self._recent.append((time.monotonic(), self.usage.peak_rss(task)))
+                metrics.set("parrot_rcc_slots_used", len(self.used))
+        finally:
+            self.waiting -= 1
+        try:
+            yield idx
+        finally:
+            async with self._condition:
+                self.used.discard(idx)
+                metrics.set("parrot_rcc_slots_used", len(self.used))
+                self._condition.notify_all()
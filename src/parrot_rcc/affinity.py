@@ -0,0 +1,116 @@
+from parrot_rcc.metrics import metrics
+from pathlib import Path
+from typing import List
+from typing import Optional
+from typing import Set
+from zipfile import ZipFile
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import yaml
+
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "parrot_rcc_warm_environments", "gauge", "Robot environments used on this node."
+)
+
+
+def hash_key(value: str) -> int:
+    return int.from_bytes(hashlib.sha256(value.encode("utf-8")).digest()[:8], "big")
+
+
+@functools.lru_cache(maxsize=1024)
+def environment_hash(robot: str) -> str:
+    """Return hash of the conda.yaml of the robot package.
+
+    Robots with the same conda.yaml share their holotree environment.
+    """
+    try:
+        with ZipFile(robot, "r") as fp:
+            robot_yaml = yaml.safe_load(fp.read("robot.yaml")) or {}
+            conda_yaml = fp.read(robot_yaml.get("condaConfigFile") or "conda.yaml")
+    except (OSError, KeyError, ValueError, yaml.YAMLError) as e:
+        logger.debug("Environment of %s could not be read: %s", robot, e)
+        return ""
+    return hashlib.sha256(conda_yaml).hexdigest()[:16]
+
+
+class HashRing:
+    """Consistent hash ring, which moves only a share of keys on node changes."""
+
+    def __init__(self, nodes: List[str], replicas: int = 64):
+        self._ring = sorted(
+            (hash_key(f"{node}:{replica}"), node)
+            for node in set(nodes)
+            for replica in range(replicas)
+        )
+        self._hashes = [value for value, node in self._ring]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        idx = bisect.bisect(self._hashes, hash_key(key)) % len(self._ring)
+        return self._ring[idx][1]
+
+
+class Affinity:
+    """Prefer nodes with the environment of the task already warm.
+
+    Environments are assigned to nodes with consistent hashing. Nodes poll
+    jobs for tasks with environments, which they neither own nor have used,
+    only after a delay. This lets the owner get them first, but other nodes
+    to take them over while the owner is saturated.
+    """
+
+    def __init__(self):
+        self.node_id = ""
+        self.ring = HashRing([])
+        self.delay_seconds: float = 0
+        self.path: Optional[Path] = None
+        self.warm: Set[str] = set()
+
+    def configure(
+        self, nodes: List[str], node_id: str, delay_ms: int, path: Optional[Path]
+    ):
+        self.node_id = node_id
+        self.ring = HashRing(nodes)
+        self.delay_seconds = delay_ms / 1000
+        self.path = path
+        if path is not None and path.exists():
+            try:
+                self.warm = set(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                logger.warning("Warm environments could not be loaded: %s", e)
+        metrics.set("parrot_rcc_warm_environments", len(self.warm))
+
+    def delay(self, robot: str) -> float:
+        if not self.delay_seconds:
+            return 0
+        environment = environment_hash(robot)
+        if (
+            not environment
+            or environment in self.warm
+            or self.ring.owner(environment) in (None, self.node_id)
+        ):
+            return 0
+        return self.delay_seconds
+
+    def mark_warm(self, robot: str):
+        environment = environment_hash(robot)
+        if not environment or environment in self.warm:
+            return
+        self.warm.add(environment)
+        metrics.set("parrot_rcc_warm_environments", len(self.warm))
+        if self.path is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text(json.dumps(sorted(self.warm)), encoding="utf-8")
+            except OSError as e:
+                logger.warning("Warm environments could not be saved: %s", e)
+
+
+affinity = Affinity()
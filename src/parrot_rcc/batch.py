@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from parrot_rcc.types import RobotTask
+from pyzeebe import Job
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds to wait for more jobs after the first job of a batch
+BATCH_WINDOW_MS = 500
+
+
+@dataclass
+class WorkItem:
+    job: Job
+    process_instance_key: int
+    element_instance_key: int
+    variables: Dict
+    business_key: Optional[str] = None
+
+
+Outcome = Union[Dict, Exception]
+
+
+def parse_batch(value: Any) -> Tuple[int, int]:
+    # "size" or "size,window_ms"
+    size, _, window = str(value).partition(",")
+    return int(size), int(window) if window.strip() else BATCH_WINDOW_MS
+
+
+class Batcher:
+    """Collect work items of jobs into batches executed in a single robot run.
+
+    A batch is executed once it has batch size items, or batch window after
+    its first item. Each job receives the outcome of its own work item.
+    """
+
+    def __init__(
+        self, execute: Callable[[RobotTask, List[WorkItem]], Awaitable[List[Outcome]]]
+    ):
+        self.execute = execute
+        self._pending: Dict[str, Tuple[RobotTask, List[WorkItem], List]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._running: Set[asyncio.Future] = set()
+
+    async def submit(self, robot_task: RobotTask, item: WorkItem) -> Dict:
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        # Items are batched only with items of the same robot version
+        key = robot_task.robot
+        _, items, futures = self._pending.setdefault(key, (robot_task, [], []))
+        items.append(item)
+        futures.append(future)
+        if len(items) >= robot_task.batch_size:
+            self.flush(key)
+        elif len(items) == 1:
+            self._timers[key] = loop.call_later(
+                robot_task.batch_window_ms / 1000, self.flush, key
+            )
+        return await future
+
+    def flush(self, key: str):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if key in self._pending:
+            running = asyncio.ensure_future(self.run(*self._pending.pop(key)))
+            self._running.add(running)
+            running.add_done_callback(self._running.discard)
+
+    async def run(
+        self,
+        robot_task: RobotTask,
+        items: List[WorkItem],
+        futures: List[asyncio.Future],
+    ):
+        # Jobs cancelled while waiting for their batch are left out
+        pending = [(i, f) for i, f in zip(items, futures) if not f.done()]
+        if not pending:
+            return
+        items = [item for item, future in pending]
+        futures = [future for item, future in pending]
+        logger.debug(
+            "Executing batch of %s jobs for task %s", len(items), robot_task.task
+        )
+        try:
+            try:
+                outcomes = await self.execute(robot_task, items)
+            except Exception as e:
+                outcomes = [e] * len(items)
+            for future, outcome in zip(futures, outcomes):
+                if future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+        finally:
+            for future in futures:
+                if not future.done():
+                    future.cancel()
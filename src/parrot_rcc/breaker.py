@@ -0,0 +1,90 @@
+from parrot_rcc.errors import ServiceUnavailableError
+from parrot_rcc.metrics import metrics
+from typing import Awaitable
+from typing import Callable
+from typing import Optional
+import asyncio
+import functools
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "parrot_rcc_breaker_open", "gauge", "Whether calls to the service are blocked."
+)
+
+
+class CircuitBreaker:
+    """Fail calls to a service fast after consecutive failures.
+
+    The breaker opens after threshold failures recognized by is_failure.
+    While it is open, calls raise ServiceUnavailableError, and the probe is
+    retried every interval seconds until it succeeds. Without a probe, the
+    next call is let through after the interval.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+        threshold: int = 3,
+        interval: float = 10,
+    ):
+        self.name = name
+        self.is_failure = is_failure
+        self.threshold = threshold
+        self.interval = interval
+        self.probe: Optional[Callable[[], Awaitable]] = None
+        self.failures = 0
+        self.is_open = False
+        self._probing: Optional[asyncio.Future] = None
+
+    def configure(
+        self, probe: Callable[[], Awaitable], threshold: int, interval: float
+    ):
+        self.probe = probe
+        self.threshold = threshold
+        self.interval = interval
+
+    def success(self):
+        self.failures = 0
+
+    def failure(self, error: BaseException):
+        self.failures += 1
+        if self.threshold > 0 and self.failures >= self.threshold and not self.is_open:
+            logger.warning("%s is unavailable: %s", self.name, error)
+            self.is_open = True
+            metrics.set("parrot_rcc_breaker_open", 1, service=self.name)
+            self._probing = asyncio.ensure_future(self.recover())
+
+    async def recover(self):
+        while self.is_open:
+            await asyncio.sleep(self.interval)
+            if self.probe is not None:
+                try:
+                    await self.probe()
+                except Exception as e:
+                    logger.debug("%s probe failed: %s", self.name, e)
+                    continue
+            logger.info("%s is available", self.name)
+            # Next failure opens the breaker again
+            self.failures = self.threshold - 1
+            self.is_open = False
+            metrics.set("parrot_rcc_breaker_open", 0, service=self.name)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if self.is_open:
+                raise ServiceUnavailableError(self.name)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if self.is_failure(e):
+                    self.failure(e)
+                raise
+            self.success()
+            return result
+
+        return wrapper
@@ -1,39 +1,85 @@
 from os.path import basename
+from parrot_rcc import launcher
+from parrot_rcc.adapter import ZeebeRetryAdapter
 from parrot_rcc.adapter import ZeebeVariablesAdapter
+from parrot_rcc.admission import Slots
+from parrot_rcc.affinity import affinity
+from parrot_rcc.batch import Batcher
+from parrot_rcc.batch import Outcome
+from parrot_rcc.batch import WorkItem
 from parrot_rcc.errors import ItemReleaseWithBusinessError
 from parrot_rcc.errors import ItemReleaseWithFailure
+from parrot_rcc.errors import LimitUnavailableError
 from parrot_rcc.errors import ReleaseException
-from parrot_rcc.healthz import app as healthz_app
+from parrot_rcc.errors import RunTerminatedError
+from parrot_rcc.errors import RunTimeoutError
+from parrot_rcc.errors import ServiceUnavailableError
+from parrot_rcc.holotree import holotrees
+from parrot_rcc.jobs import jobs
+from parrot_rcc.limits import create_cgroup
+from parrot_rcc.limits import remove_cgroup
+from parrot_rcc.limits import rlimit_args
+from parrot_rcc.limits import violated_limit
+from parrot_rcc.limits import watch_cgroup
+from parrot_rcc.links import s3_link
+from parrot_rcc.live import LiveLogs
+from parrot_rcc.live import PROGRESS_LISTENER
+from parrot_rcc.monitor import frame_job_key
+from parrot_rcc.monitor import LoopMonitor
+from parrot_rcc.profiler import Sampler
+from parrot_rcc.replay import get_recorder
+from parrot_rcc.replay import Recorder
+from parrot_rcc.replay import replay as replay_jobs
+from parrot_rcc.results import load_result
+from parrot_rcc.results import release_from_json
+from parrot_rcc.results import save_result
+from parrot_rcc.retry import ATTEMPT_VARIABLE
+from parrot_rcc.retry import RetryPolicy
+from parrot_rcc.robots import Robots
+from parrot_rcc.s3 import create_s3_client
+from parrot_rcc.s3 import create_s3_resource
+from parrot_rcc.s3 import s3_breaker
 from parrot_rcc.s3 import s3_generate_presigned_url
 from parrot_rcc.s3 import s3_list_files
+from parrot_rcc.s3 import s3_probe
 from parrot_rcc.s3 import s3_put_object
 from parrot_rcc.s3 import s3_upload_file
-from parrot_rcc.types import ItemRelease
-from parrot_rcc.types import ItemReleaseException
 from parrot_rcc.types import ItemReleaseExceptionType
 from parrot_rcc.types import ItemReleaseState
 from parrot_rcc.types import LogLevel
 from parrot_rcc.types import Options
+from parrot_rcc.types import RobotTask
+from parrot_rcc.usage import read_usage
+from parrot_rcc.usage import task_usage
+from parrot_rcc.utils import gather_limited
 from parrot_rcc.utils import inline_screenshots
+from parrot_rcc.utils import job_context
+from parrot_rcc.utils import preload
 from parrot_rcc.utils import setup_logging
+from parrot_rcc.utils import Timings
+from parrot_rcc.variables import offload_variables
+from parrot_rcc.variables import resolve_variables
+from parrot_rcc.vault import fetch_secrets
+from parrot_rcc.vault import vault_breaker
+from parrot_rcc.vault import vault_probe
+from parrot_rcc.worker import Worker
+from parrot_rcc.workspace import JobWorkspace
+from parrot_rcc.workspace import Workspace
 from pathlib import Path
 from pyzeebe import create_camunda_cloud_channel
 from pyzeebe import create_insecure_channel
 from pyzeebe import Job
 from pyzeebe import JobStatus
 from pyzeebe import TaskConfig
-from pyzeebe import ZeebeWorker
 from pyzeebe.task import task_builder
-from tempfile import TemporaryDirectory
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Tuple
-from zipfile import ZipFile
-import aiohttp
 import asyncio
-import boto3
 import click
 import dataclasses
+import functools
 import json
 import logging
 import multiprocessing
@@ -41,13 +87,20 @@ import os
 import pprint
 import re
 import shutil
-import yaml
+import signal
+import socket
+import sys
+import threading
+import time
 
 
 os.environ["GRPC_ENABLE_FORK_SUPPORT"] = "0"
 
 logger = logging.getLogger(__name__)
 
+# Maximum presigned URLs for input files generated at once
+PRESIGN_CONCURRENCY = 16
+
 WORK_ITEM_ADAPTER = """\
 from RPA.Robocorp.WorkItems import FileAdapter
 from RPA.Robocorp.utils import Requests
@@ -63,6 +116,20 @@ class WorkItemAdapter(FileAdapter):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._workitem_requests = Requests("", default_headers={})
+        self._batch = {"releases": {}, "outputs": []}
+
+    def _save_batch(self):
+        # Batch of jobs needs outcomes by input item
+        path = os.environ.get("RPA_BATCH_WORKITEMS_PATH")
+        if path:
+            with open(path, "w", encoding="utf-8") as fp:
+                fp.write(json.dumps(self._batch))
+
+    def create_output(self, parent_id, payload=None):
+        item_id = super().create_output(parent_id, payload)
+        self._batch["outputs"].append(str(parent_id))
+        self._save_batch()
+        return item_id
 
     def release_input(self, item_id, state, exception=None):
         # ignore library's internal release calls; no implicit retry
@@ -84,6 +151,8 @@ class WorkItemAdapter(FileAdapter):
         path = os.environ["RPA_RELEASE_WORKITEM_PATH"]
         with open(path, "w", encoding="utf-8") as fp:
             fp.write(json.dumps(body))
+        self._batch["releases"][str(item_id)] = body
+        self._save_batch()
         super(WorkItemAdapter, self).release_input(item_id, state, exception)
 
     def get_file(self, item_id: str, name: str) -> bytes:
@@ -120,7 +189,8 @@ def job_to_dict(job: Job) -> dict:
         "worker": job.worker,
         "retries": job.retries,
         "deadline": job.deadline,
-        "variables": job.variables,
+        # Copy, because log messages are formatted later in another thread
+        "variables": dict(job.variables),
     }
 
 
@@ -140,10 +210,58 @@ class lazydecode:
         return "\n".join([b.decode() for b in self.data])
 
 
+async def terminate(proc: asyncio.subprocess.Process, grace: float):
+    # The process was started into its own session (and process group),
+    # which allows the whole process tree (e.g. browsers) to be signalled.
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(proc.wait(), grace)
+    except asyncio.TimeoutError:
+        logger.warning("Process %s did not terminate in %s seconds", proc.pid, grace)
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+
+
+async def read_stream(stream: asyncio.StreamReader, buffer: bytearray) -> bytes:
+    while True:
+        chunk = await stream.read(64 * 1024)
+        if not chunk:
+            return bytes(buffer)
+        buffer.extend(chunk)
+
+
 async def run(
-    program: str, args: List[str], cwd: str, env: Dict[str, str]
+    program: str,
+    args: List[str],
+    cwd: str,
+    env: Dict[str, str],
+    timeout: Optional[float] = None,
+    kill_grace: float = 10,
+    stop: Optional[asyncio.Event] = None,
+    usage: Optional[str] = None,
+    limits: Optional[List[str]] = None,
+    buffers: Optional[Tuple[bytearray, bytearray]] = None,
 ) -> Tuple[int, bytes, bytes]:
     logger.debug(f"{program + ' ' + ' '.join(map(str, args))}")
+    if usage is not None or limits:
+        # Resource usage and limits of the process tree are handled by a launcher
+        args = [
+            "-I",
+            "-S",
+            launcher.__file__,
+            *(["--usage", usage] if usage is not None else []),
+            *(limits or []),
+            "--",
+            program,
+            *args,
+        ]
+        program = sys.executable
     proc = await asyncio.create_subprocess_exec(
         program,
         *args,
@@ -151,9 +269,40 @@ async def run(
         stderr=asyncio.subprocess.PIPE,
         cwd=cwd,
         env=os.environ | env | {"PYTHONPATH": ""},
+        start_new_session=True,
     )
 
-    stdout, stderr = await proc.communicate()
+    # Streams are read separately from waiting for the process to keep
+    # partial output available when the process needs to be terminated.
+    buffers = buffers or (bytearray(), bytearray())
+    readers = [
+        asyncio.ensure_future(read_stream(proc.stdout, buffers[0])),
+        asyncio.ensure_future(read_stream(proc.stderr, buffers[1])),
+    ]
+    waiters = [asyncio.ensure_future(proc.wait())] + (
+        [asyncio.ensure_future(stop.wait())] if stop is not None else []
+    )
+    try:
+        done, pending = await asyncio.wait(
+            waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+    except asyncio.CancelledError:
+        await terminate(proc, kill_grace)
+        for future in readers + waiters:
+            future.cancel()
+        raise
+    for future in pending:
+        future.cancel()
+    terminated = waiters[0] not in done
+    if terminated:
+        logger.warning("Terminating process %s", proc.pid)
+        await terminate(proc, kill_grace)
+
+    # Orphaned grandchildren may still keep the pipes open
+    done, pending = await asyncio.wait(readers, timeout=kill_grace)
+    for reader in pending:
+        reader.cancel()
+    stdout, stderr = [bytes(buffer) for buffer in buffers]
     stdout = stdout.strip() or b""
     stderr = stderr.strip() or b""
 
@@ -164,6 +313,13 @@ async def run(
 
     logger.debug(f"exit code {proc.returncode}")
 
+    if terminated and stop is not None and stop.is_set():
+        raise RunTerminatedError(
+            "Process was terminated", proc.returncode, stdout, stderr
+        )
+    elif terminated:
+        raise RunTimeoutError(timeout, proc.returncode, stdout, stderr)
+
     return proc.returncode, stdout, stderr
 
 
@@ -177,299 +333,717 @@ def fail_reason(robot_dir: str) -> str:
     return reason
 
 
+def variables_to_fetch(robot_task: RobotTask, config: Options) -> List[str]:
+    # Empty list makes Zeebe to return all variables
+    if robot_task.variables is None:
+        return []
+    return sorted(
+        set(robot_task.variables)
+        | ({config.business_key} - {""})
+        | ({ATTEMPT_VARIABLE} if robot_task.retry is not None else set())
+    )
+
+
 def create_task(
     task: str,
-    robot: str,
-    vault: Dict[str, str],
-    semaphore: asyncio.Semaphore,
+    robots: Robots,
+    slots: Slots,
+    workspace: Workspace,
     config: Options,
 ):
+    # Replayed jobs must not overwrite the files of their recorded originals
+    key_prefix = (
+        f"{config.replay_s3_prefix.strip('/')}/"
+        if config.replay and config.replay_s3_prefix.strip("/")
+        else ""
+    )
+
+    async def handle_error(exception: Exception, job: Job):
+        # Retry policy is carried from the robot version the job was executed with
+        retry = exception.retry if isinstance(exception, ReleaseException) else None
+        await on_error(exception, job, retry)
+
     task_config = TaskConfig(
         type=task,
-        exception_handler=on_error,
+        exception_handler=handle_error,
         timeout_ms=config.task_timeout_ms,
-        max_jobs_to_activate=config.task_max_jobs,
-        max_running_jobs=config.task_max_jobs,
-        variables_to_fetch=[],
+        # Batched jobs wait for the rest of their batch without a slot
+        max_jobs_to_activate=config.task_max_jobs * robots[task].batch_size,
+        max_running_jobs=config.task_max_jobs * robots[task].batch_size,
+        variables_to_fetch=variables_to_fetch(robots[task], config),
         single_value=False,
         variable_name="",
-        before=[before_job],
+        before=(
+            [record_job(get_recorder(config.record, config.record_redact))]
+            if config.record
+            else []
+        )
+        + [before_job],
         after=[after_job],
     )
 
     async def execute_task(
-        __process_instance_key: int, __element_instance_key: int, **kwargs
+        __job: Job, __process_instance_key: int, __element_instance_key: int, **kwargs
     ):
-        async with semaphore:
-            # https://gist.github.com/heitorlessa/5b709df96ea6ac5ddc600545c0683d3b
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=config.rcc_s3_url,
-                aws_access_key_id=config.rcc_s3_access_key_id,
-                aws_secret_access_key=config.rcc_s3_secret_access_key,
-                aws_session_token=None,
-                config=boto3.session.Config(signature_version="s3v4"),
-                region_name=config.rcc_s3_region,
-                verify=False,
-            )
-            s3_resource = boto3.resource(
-                "s3",
-                endpoint_url=config.rcc_s3_url,
-                aws_access_key_id=config.rcc_s3_access_key_id,
-                aws_secret_access_key=config.rcc_s3_secret_access_key,
-                aws_session_token=None,
-                config=boto3.session.Config(signature_version="s3v4"),
-                region_name=config.rcc_s3_region,
-                verify=False,
-            )
-
-            business_key = (
-                kwargs.get(config.business_key) if config.business_key else None
-            )
-            vault_json_data = {}
-            async with aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=5),
-                headers={
-                    "Accept": "application/json",
-                    "X-Vault-Token": config.vault_token,
-                },
-            ) as session:
-                for secret_name, secret_path in vault.items():
-                    vault_url = (
-                        f"{config.vault_addr.strip('/')}/{secret_path.strip('/')}"
+        with jobs.track(__job) as running:
+            try:
+                # Job is executed with the robot version available when it was activated
+                robot_task = robots[task]
+                service = unavailable(robot_task)
+                if service:
+                    raise ServiceUnavailableError(service)
+
+                # Complete job from the recorded outcome of its previous execution
+                result_key = (
+                    f"{__process_instance_key}/{__element_instance_key}/result.json"
+                )
+                # Replay would not measure jobs completed from recorded results
+                if robot_task.idempotent and not config.replay:
+                    result = await load_result(
+                        create_s3_client(config), config.rcc_s3_bucket_logs, result_key
                     )
-                    try:
-                        vault_resp = await session.get(vault_url)
-                        vault_json_data[secret_name] = (await vault_resp.json())[
-                            "data"
-                        ]["data"]
-                    except Exception as e:
-                        raise Exception(
-                            f'Task secret "{secret_name}" at "{secret_path}" could not be loaded: {vault_resp}'
-                        ) from e
-
-            if config.rcc_fixed_spaces:
-                space = "parrot-" + (
-                    "".join(re.findall(r"[\w-]", re.sub(r"\W+", "-", task.lower())))
-                    or "0000"
+                    if result is not None:
+                        payload, release = result
+                        logger.info(
+                            "Job %s was completed from %s", __job.key, result_key
+                        )
+                        if release.state == ItemReleaseState.FAILED:
+                            raise ItemReleaseWithBusinessError(
+                                release.exception.message,
+                                code=release.exception.code,
+                                payload=payload,
+                            )
+                        return payload
+
+                # Retry attempts are counted for the worker, not the robot
+                kwargs.pop(ATTEMPT_VARIABLE, None)
+                item = WorkItem(
+                    __job,
+                    __process_instance_key,
+                    __element_instance_key,
+                    kwargs,
+                    kwargs.get(config.business_key) if config.business_key else None,
                 )
-            else:
-                idx = config.task_max_jobs - semaphore._value
-                space = f"parrot-{idx:04}"
-            with TemporaryDirectory() as robot_dir, TemporaryDirectory() as data_dir:
+                if robot_task.batch_size > 1:
+                    return await batcher.submit(robot_task, item)
+                (outcome,) = await execute_items(robot_task, [item])
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+            except ItemReleaseWithFailure as e:
+                e.retry = robot_task.retry
+                raise
+            except asyncio.CancelledError:
+                if running.cancelled is None:
+                    raise
+                raise ReleaseException(
+                    f"Job {__job.key} was cancelled: {running.cancelled}",
+                    code="CANCELLED",
+                    payload={},
+                )
+
+    async def execute_items(
+        robot_task: RobotTask, items: List[WorkItem]
+    ) -> List[Outcome]:
+        robot, vault = robot_task.robot, robot_task.vault
+        # Items of a batch are released separately with their input item ids
+        batch = robot_task.batch_size > 1
+        first = items[0]
+        keys = [item.job.key for item in items]
+        job_keys = ", ".join(f"{key}" for key in keys)
+        s3_client = create_s3_client(config)
+        s3_resource = create_s3_resource(config)
+        # Prepared work items by job key
+        entries: Dict[int, Dict] = {}
+
+        def write_items(data_dir: Path):
+            with open(data_dir / "items.json", "w", encoding="utf-8") as fp:
+                items_json_dump = json.dumps(
+                    [entries[item.job.key] for item in items], indent=4
+                )
+                fp.write(items_json_dump)
+                logger.debug("Work items: %s", items_json_dump)
+
+        async def prepare(job_dir: JobWorkspace):
+            robot_dir, data_dir = job_dir.robot_dir, job_dir.data_dir
+            # Jobs may be left out of the batch while it is prepared
+            prepared = items
+
+            async def unwrap():
                 return_code, stdout, stderr = await run(
                     config.rcc_executable,
-                    ["robot", "unwrap", "-d", robot_dir, "-z", robot],
+                    ["robot", "unwrap", "-d", str(robot_dir), "-z", robot],
                     os.getcwd(),
                     {},
                 )
                 assert return_code == 0, lazydecode(stderr)
-
-                (Path(robot_dir) / "WorkItemAdapter.py").write_text(
+                (robot_dir / "WorkItemAdapter.py").write_text(
                     WORK_ITEM_ADAPTER, encoding="utf-8"
                 )
-                vault_json_path = Path(data_dir) / "vault.json"
-                items_json_path = Path(data_dir) / "items.json"
-                output_json_path = Path(data_dir) / "items.output.json"
-                release_json_path = Path(data_dir) / "items.release.json"
-                with open(vault_json_path, "w", encoding="utf-8") as fp:
+                if config.rcc_s3_live_interval:
+                    (robot_dir / "ProgressListener.py").write_text(
+                        PROGRESS_LISTENER, encoding="utf-8"
+                    )
+
+            async def write_vault_json():
+                vault_json_data = await fetch_secrets(vault, config)
+                with open(data_dir / "vault.json", "w", encoding="utf-8") as fp:
                     fp.write(
                         json.dumps(
                             vault_json_data | {"env": dict(os.environ)}, indent=4
                         )
                     )
-                items_files = {}
-                for key in await s3_list_files(
+
+            async def presign_files(item: WorkItem) -> Dict[str, str]:
+                keys = await s3_list_files(
                     s3_resource,
                     config.rcc_s3_bucket_data,
-                    f"{business_key or __process_instance_key}/",
-                ):
-                    file_path = Path(data_dir) / key.split(",", 1)[-1]
+                    f"{item.business_key or item.process_instance_key}/",
+                )
+                for key in keys:
+                    file_path = data_dir / key.split(",", 1)[-1]
                     file_path.parent.mkdir(parents=True, exist_ok=True)
-                    items_files[basename(key)] = await s3_generate_presigned_url(
-                        s3_client,
-                        config.rcc_s3_bucket_data,
-                        key,
-                        max(1, int(config.task_timeout_ms / 1000)),
-                    )
-
-                with open(items_json_path, "w", encoding="utf-8") as fp:
-                    items_json_dump = json.dumps(
-                        [
-                            {
-                                "payload": kwargs,
-                                "files": items_files,
-                            }
-                        ],
-                        indent=4,
-                    )
-                    fp.write(items_json_dump)
-                    logger.debug("Work item: %s", items_json_dump)
-
-                return_code, stdout, stderr = await run(
-                    config.rcc_executable,
+                urls = await gather_limited(
+                    PRESIGN_CONCURRENCY,
                     [
-                        "run",
-                        "--controller",
-                        config.rcc_controller,
-                        "--space",
-                        space,
-                        "--task",
-                        task,
+                        s3_generate_presigned_url(
+                            s3_client,
+                            config.rcc_s3_bucket_data,
+                            key,
+                            max(1, int(config.task_timeout_ms / 1000)),
+                        )
+                        for key in keys
                     ],
-                    robot_dir,
-                    {
-                        "RPA_SECRET_MANAGER": "RPA.Robocloud.Secrets.FileSecrets",
-                        "RPA_SECRET_FILE": f"{vault_json_path}",
-                        "RPA_WORKITEMS_ADAPTER": "WorkItemAdapter.WorkItemAdapter",
-                        "RPA_INPUT_WORKITEM_PATH": f"{items_json_path}",
-                        "RPA_OUTPUT_WORKITEM_PATH": f"{output_json_path}",
-                        "RPA_RELEASE_WORKITEM_PATH": f"{release_json_path}",
-                        "RC_WORKSPACE_ID": "1",
-                        "RC_WORKITEM_ID": "1",
-                    },
                 )
+                return {basename(key): url for key, url in zip(keys, urls)}
+
+            # Preparation steps do not depend on each other
+            _, _, _, items_files, items_payloads = await asyncio.gather(
+                unwrap(),
+                holotrees.prepare(s3_client, s3_resource, robot),
+                write_vault_json(),
+                asyncio.gather(*[presign_files(item) for item in prepared]),
+                asyncio.gather(
+                    *[resolve_variables(s3_client, item.variables) for item in prepared]
+                ),
+            )
+            for item, items_payload, files in zip(
+                prepared, items_payloads, items_files
+            ):
+                entries[item.job.key] = {"payload": items_payload, "files": files}
+            write_items(data_dir)
+
+        async with workspace.job(f"{first.job.key}") as job_dir:
+            # Robot is prepared while the job is waiting for a slot
+            preparing = (
+                asyncio.ensure_future(prepare(job_dir))
+                if config.task_prepare_early
+                else None
+            )
+            cgroup = None
+            skipped: Dict[int, Outcome] = {}
+            try:
+                async with slots.acquire(task) as idx:
+                    # Jobs cancelled or expired while waiting for the slot are left out
+                    margin = min(
+                        config.task_deadline_margin_ms, config.task_timeout_ms // 2
+                    )
+                    for i, item in enumerate(items):
+                        if item.job.key not in jobs or jobs.cancelled(item.job.key):
+                            skipped[i] = ReleaseException(
+                                f"Job {item.job.key} was cancelled before it could be started",
+                                code="CANCELLED",
+                                payload={},
+                            )
+                        elif (item.job.deadline - margin) / 1000 <= time.time():
+                            skipped[i] = ItemReleaseWithFailure(
+                                f"Job {item.job.key} deadline expired before it could be started",
+                                code="TIMEOUT",
+                                payload={},
+                            )
+                    if len(skipped) == len(items):
+                        return [skipped[i] for i in range(len(items))]
+                    if skipped:
+                        items = [
+                            item for i, item in enumerate(items) if i not in skipped
+                        ]
+                        first = items[0]
+                        keys = [item.job.key for item in items]
+                        job_keys = ", ".join(f"{key}" for key in keys)
+
+                    # Robot must be terminated before Zeebe would re-assign any job
+                    deadline = (
+                        min(item.job.deadline for item in items) - margin
+                    ) / 1000
+                    jobs.update(keys, phase="preparing")
+                    try:
+                        await asyncio.wait_for(
+                            preparing or prepare(job_dir), deadline - time.time()
+                        )
+                    except asyncio.TimeoutError:
+                        if deadline > time.time():
+                            raise
+                    # Robot is not started when preparing it used the remaining time
+                    if deadline <= time.time():
+                        raise ItemReleaseWithFailure(
+                            f"Job {job_keys} deadline expired before its robot was prepared",
+                            code="TIMEOUT",
+                            payload={},
+                        )
+                    # Items were prepared before the skipped jobs were left out
+                    if skipped:
+                        write_items(job_dir.data_dir)
+
+                    if config.rcc_fixed_spaces:
+                        space = "parrot-" + (
+                            "".join(
+                                re.findall(r"[\w-]", re.sub(r"\W+", "-", task.lower()))
+                            )
+                            or "0000"
+                        )
+                    else:
+                        space = f"parrot-{idx:04}"
+                    robot_dir, data_dir = str(job_dir.robot_dir), str(job_dir.data_dir)
+                    vault_json_path = Path(data_dir) / "vault.json"
+                    items_json_path = Path(data_dir) / "items.json"
+                    output_json_path = Path(data_dir) / "items.output.json"
+                    release_json_path = Path(data_dir) / "items.release.json"
+                    batch_json_path = Path(data_dir) / "items.batch.json"
+                    progress_json_path = Path(data_dir) / "progress.json"
+                    listener_path = Path(robot_dir) / "ProgressListener.py"
+                    usage_json_path = job_dir.path / "usage.json"
+
+                    # Fail job without retries when its limits cannot be enforced
+                    if config.task_cgroup_root and robot_task.limits:
+                        try:
+                            cgroup = create_cgroup(
+                                config.task_cgroup_root,
+                                f"{first.job.key}",
+                                robot_task.limits,
+                            )
+                        except LimitUnavailableError as e:
+                            raise ReleaseException(
+                                f"{e}", code="LIMIT_UNAVAILABLE", payload={}
+                            )
+                    limits = rlimit_args(robot_task.limits, cgroup) + (
+                        ["--cgroup", str(cgroup)] if cgroup is not None else []
+                    )
 
-                files = {}
-                payload = {}
-                if output_json_path.exists():
-                    with open(output_json_path, "r", encoding="utf-8") as fp:
-                        output_json = json.loads(fp.read())
-                        for item in output_json:
-                            files = item.get("files") or {}
-                            payload = item.get("payload") or {}
-                            break
-
-                for key, value in files.items():
-                    file_path = (
-                        Path(data_dir) / value
-                        if (Path(data_dir) / value).exists()
-                        else value
-                        if value.exists()
+                    terminated = None
+                    stop = asyncio.Event()
+                    jobs.update(keys, phase="running", space=space, stop=stop)
+                    watcher = asyncio.ensure_future(workspace.watch(job_dir, stop))
+                    cgroup_watcher = (
+                        asyncio.ensure_future(
+                            watch_cgroup(cgroup, robot_task.limits, stop)
+                        )
+                        if cgroup is not None
                         else None
                     )
-                    if file_path:
-                        await s3_upload_file(
+                    # Output of long runs is uploaded while the robot runs
+                    live = (
+                        LiveLogs(
                             s3_client,
-                            str(file_path),
-                            config.rcc_s3_bucket_data,
-                            f"{business_key or __process_instance_key}/{key}",
+                            config.rcc_s3_bucket_logs,
+                            f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}",
+                            config.rcc_s3_live_interval,
+                            progress_json_path,
                         )
-                        payload[key] = await s3_generate_presigned_url(
-                            s3_client,
-                            config.rcc_s3_bucket_data,
-                            f"{business_key or __process_instance_key}/{key}",
-                            config.rcc_s3_url_expires_in,
+                        if config.rcc_s3_live_interval
+                        else None
+                    )
+                    live_watcher = (
+                        asyncio.ensure_future(live.watch())
+                        if live is not None
+                        else None
+                    )
+                    try:
+                        return_code, stdout, stderr = await run(
+                            config.rcc_executable,
+                            [
+                                "run",
+                                "--controller",
+                                config.rcc_controller,
+                                "--space",
+                                space,
+                                "--task",
+                                task,
+                            ],
+                            robot_dir,
+                            {
+                                "RPA_SECRET_MANAGER": "RPA.Robocloud.Secrets.FileSecrets",
+                                "RPA_SECRET_FILE": f"{vault_json_path}",
+                                "RPA_WORKITEMS_ADAPTER": "WorkItemAdapter.WorkItemAdapter",
+                                "RPA_INPUT_WORKITEM_PATH": f"{items_json_path}",
+                                "RPA_OUTPUT_WORKITEM_PATH": f"{output_json_path}",
+                                "RPA_RELEASE_WORKITEM_PATH": f"{release_json_path}",
+                                "RC_WORKSPACE_ID": "1",
+                                "RC_WORKITEM_ID": "1",
+                            }
+                            | (
+                                {"RPA_BATCH_WORKITEMS_PATH": f"{batch_json_path}"}
+                                if batch
+                                else {}
+                            )
+                            | (
+                                {
+                                    "PARROT_RCC_PROGRESS_PATH": f"{progress_json_path}",
+                                    "ROBOT_OPTIONS": (
+                                        f"{os.environ.get('ROBOT_OPTIONS', '')} "
+                                        f"--listener {listener_path}"
+                                    ).strip(),
+                                }
+                                if live is not None
+                                else {}
+                            ),
+                            timeout=deadline - time.time(),
+                            kill_grace=config.task_kill_grace_ms / 1000,
+                            stop=stop,
+                            usage=str(usage_json_path),
+                            limits=limits,
+                            buffers=(live.stdout, live.stderr) if live else None,
                         )
+                    except RunTerminatedError as e:
+                        terminated = e
+                        return_code, stdout, stderr = e.return_code, e.stdout, e.stderr
+                    finally:
+                        watcher.cancel()
+                        if cgroup_watcher is not None:
+                            cgroup_watcher.cancel()
+                        if live_watcher is not None:
+                            live_watcher.cancel()
+                        jobs.update(keys, phase="saving", stop=None)
+                    usage = read_usage(str(usage_json_path))
+                    if usage:
+                        task_usage.record(task, usage)
+                        logger.info("Job %s used %s", job_keys, usage)
+                    if return_code == 0 or any(Path(robot_dir).glob("*/**/output.xml")):
+                        # Robot was run in its environment
+                        affinity.mark_warm(robot)
+                        holotrees.built(s3_client, s3_resource, robot)
+                    limit = violated_limit(
+                        robot_task.limits, cgroup, b"\n".join([stdout, stderr])
+                    )
+                    if cgroup is not None:
+                        await remove_cgroup(cgroup)
+                        cgroup = None
+
+                # Slot is released for the next job before results are saved
+                logger.debug(
+                    "Job %s used %s kB of scratch space",
+                    job_keys,
+                    await workspace.measure(job_dir) // 1024,
+                )
 
+                # Logs of a batch are saved once with the first job
+                logs = {}
                 for file_path in Path(robot_dir).glob("*/**/log.html"):
-                    inline_screenshots(str(file_path))
+                    await asyncio.get_event_loop().run_in_executor(
+                        None, inline_screenshots, str(file_path)
+                    )
                     await s3_upload_file(
                         s3_client,
                         str(file_path),
                         config.rcc_s3_bucket_logs,
-                        f"{__process_instance_key}/{__element_instance_key}/log.html",
+                        f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/log.html",
                     )
-                    payload["log.html"] = await s3_generate_presigned_url(
+                    logs["log.html"] = await s3_link(
                         s3_client,
+                        config,
                         config.rcc_s3_bucket_logs,
-                        f"{__process_instance_key}/{__element_instance_key}/log.html",
-                        config.rcc_s3_url_expires_in,
+                        f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/log.html",
                     )
                 for file_path in Path(robot_dir).glob("*/**/output.xml"):
-                    inline_screenshots(str(file_path))
+                    await asyncio.get_event_loop().run_in_executor(
+                        None, inline_screenshots, str(file_path)
+                    )
                     await s3_upload_file(
                         s3_client,
                         str(file_path),
                         config.rcc_s3_bucket_logs,
-                        f"{__process_instance_key}/{__element_instance_key}/output.xml",
+                        f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/output.xml",
                     )
-                    payload["output.xml"] = await s3_generate_presigned_url(
+                    logs["output.xml"] = await s3_link(
                         s3_client,
+                        config,
                         config.rcc_s3_bucket_logs,
-                        f"{__process_instance_key}/{__element_instance_key}/output.xml",
-                        config.rcc_s3_url_expires_in,
+                        f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/output.xml",
                     )
                 await s3_put_object(
                     s3_client,
                     config.rcc_s3_bucket_logs,
-                    f"{__process_instance_key}/{__element_instance_key}/stdout.txt",
+                    f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/stdout.txt",
                     stdout,
                     "text/plain",
                 )
-                payload["stdout.txt"] = await s3_generate_presigned_url(
+                logs["stdout.txt"] = await s3_link(
                     s3_client,
+                    config,
                     config.rcc_s3_bucket_logs,
-                    f"{__process_instance_key}/{__element_instance_key}/stdout.txt",
-                    config.rcc_s3_url_expires_in,
+                    f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/stdout.txt",
                 )
                 await s3_put_object(
                     s3_client,
                     config.rcc_s3_bucket_logs,
-                    f"{__process_instance_key}/{__element_instance_key}/stderr.txt",
+                    f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/stderr.txt",
                     stderr,
                     "text/plain",
                 )
-                payload["stderr.txt"] = await s3_generate_presigned_url(
+                logs["stderr.txt"] = await s3_link(
                     s3_client,
+                    config,
                     config.rcc_s3_bucket_logs,
-                    f"{__process_instance_key}/{__element_instance_key}/stderr.txt",
-                    config.rcc_s3_url_expires_in,
+                    f"{key_prefix}{first.process_instance_key}/{first.element_instance_key}/stderr.txt",
                 )
 
-                # Resolve possible item release state
-                if release_json_path.exists():
-                    with open(release_json_path, "r", encoding="utf-8") as fp:
-                        release_json = json.loads(fp.read())
+                outputs = []
+                if output_json_path.exists():
+                    with open(output_json_path, "r", encoding="utf-8") as fp:
+                        outputs = json.loads(fp.read())
+                # Parent input item ids of output items, and releases by input item id
+                if batch_json_path.exists():
+                    with open(batch_json_path, "r", encoding="utf-8") as fp:
+                        batch_json = json.loads(fp.read())
                 else:
-                    release_json = {}
-                release = ItemRelease(
-                    state=ItemReleaseState.FAILED
-                    if release_json.get("state") == "FAILED"
-                    else ItemReleaseState.DONE,
-                    exception=None
-                    if not release_json.get("exception")
-                    else ItemReleaseException(
-                        type=ItemReleaseExceptionType.BUSINESS
-                        if (release_json.get("exception") or {}).get("type")
-                        == "BUSINESS"
-                        else ItemReleaseExceptionType.APPLICATION,
-                        code=(release_json.get("exception") or {}).get("code") or "",
-                        message=(release_json.get("exception") or {}).get("message")
-                        or "",
-                    ),
-                )
+                    batch_json = {}
+                parents = batch_json.get("outputs") or []
+                releases = batch_json.get("releases") or {}
+
+                async def finish(i: int, item: WorkItem) -> Dict:
+                    item_id = f"{i}"
+                    prefix = (
+                        f"{key_prefix}{item.business_key or item.process_instance_key}"
+                    )
+                    files = {}
+                    payload = {}
+                    for output, parent in zip(
+                        outputs, parents if batch else [item_id] * len(outputs)
+                    ):
+                        if parent == item_id:
+                            files = output.get("files") or {}
+                            payload = output.get("payload") or {}
+                            break
 
-                # Raise possible release exception
-                if release.state == ItemReleaseState.FAILED:
-                    if release.exception.type == ItemReleaseExceptionType.BUSINESS:
-                        raise ItemReleaseWithBusinessError(
-                            release.exception.message or fail_reason(robot_dir),
-                            code=release.exception.code,
+                    for key, value in files.items():
+                        file_path = (
+                            Path(data_dir) / value
+                            if (Path(data_dir) / value).exists()
+                            else value
+                            if value.exists()
+                            else None
+                        )
+                        if file_path:
+                            await s3_upload_file(
+                                s3_client,
+                                str(file_path),
+                                config.rcc_s3_bucket_data,
+                                f"{prefix}/{key}",
+                            )
+                            payload[key] = await s3_link(
+                                s3_client,
+                                config,
+                                config.rcc_s3_bucket_data,
+                                f"{prefix}/{key}",
+                            )
+                    payload |= logs
+
+                    if usage and config.task_usage_variable:
+                        payload[config.task_usage_variable] = usage
+
+                    # Store large variables in S3 instead of process variables
+                    payload = await offload_variables(
+                        s3_client,
+                        payload,
+                        config.rcc_s3_bucket_data,
+                        f"{key_prefix}variables/{item.process_instance_key}/{item.element_instance_key}",
+                        config.rcc_s3_offload_threshold,
+                    )
+
+                    # Fail job without retries when it was cancelled
+                    cancelled = jobs.cancelled(item.job.key)
+                    if cancelled is not None:
+                        raise ReleaseException(
+                            f"Job {item.job.key} was cancelled: {cancelled}",
+                            code="CANCELLED",
                             payload=payload,
                         )
+
+                    # Resolve possible item release state
+                    if batch:
+                        release_json = releases.get(item_id) or {}
+                    elif release_json_path.exists():
+                        with open(release_json_path, "r", encoding="utf-8") as fp:
+                            release_json = json.loads(fp.read())
                     else:
+                        release_json = {}
+                    release = release_from_json(release_json)
+                    # Released items of a batch do not depend on the rest of the run
+                    released = batch and item_id in releases
+
+                    # Record final outcome to complete a re-delivered job from it;
+                    # retryable failures are expected to be executed again
+                    business_error = (
+                        release.state == ItemReleaseState.FAILED
+                        and release.exception is not None
+                        and release.exception.type == ItemReleaseExceptionType.BUSINESS
+                    )
+                    if robot_task.idempotent and (
+                        (business_error and (terminated is None or released))
+                        or (
+                            release.state == ItemReleaseState.DONE
+                            and (released or (terminated is None and return_code == 0))
+                        )
+                    ):
+                        if business_error:
+                            release.exception.message = (
+                                release.exception.message or fail_reason(robot_dir)
+                            )
+                        await save_result(
+                            s3_client,
+                            config.rcc_s3_bucket_logs,
+                            f"{key_prefix}{item.process_instance_key}/{item.element_instance_key}/result.json",
+                            payload,
+                            release,
+                        )
+
+                    # Raise possible release exception
+                    if release.state == ItemReleaseState.FAILED:
+                        if release.exception.type == ItemReleaseExceptionType.BUSINESS:
+                            raise ItemReleaseWithBusinessError(
+                                release.exception.message or fail_reason(robot_dir),
+                                code=release.exception.code,
+                                payload=payload,
+                            )
+                        else:
+                            raise ItemReleaseWithFailure(
+                                release.exception.message or fail_reason(robot_dir),
+                                code=release.exception.code,
+                                payload=payload,
+                            )
+                    if released:
+                        return payload
+
+                    # Fail job with retries when its robot run was cancelled
+                    if any(jobs.cancelled(key) is not None for key in keys):
+                        raise ItemReleaseWithFailure(
+                            f"Robot run of job {item.job.key} was cancelled with another job",
+                            code="CANCELLED",
+                            payload=payload,
+                        )
+
+                    # Fail job with retries when robot was terminated at deadline
+                    if isinstance(terminated, RunTimeoutError):
+                        raise ItemReleaseWithFailure(
+                            f"Task {task} exceeded its deadline: {terminated}",
+                            code="TIMEOUT",
+                            payload=payload,
+                        )
+
+                    # Fail job without retries when robot exceeded its disk quota
+                    if job_dir.exceeded:
+                        raise ReleaseException(
+                            f"Task {task} exceeded its disk quota of {config.work_quota_mb} MB",
+                            code="QUOTA",
+                            payload=payload,
+                        )
+
+                    # Fail job without retries when the launcher could not apply limits
+                    if return_code == launcher.LIMITS_FAILED and not usage:
+                        raise ReleaseException(
+                            stderr.decode().strip(),
+                            code="LIMIT_UNAVAILABLE",
+                            payload=payload,
+                        )
+
+                    # Fail job without retries when robot exceeded its resource limits
+                    if return_code != 0 and limit is not None:
+                        raise ReleaseException(
+                            f"Task {task} exceeded its {limit} limit of {robot_task.limits[limit]}",
+                            code=f"LIMIT_{limit.upper()}",
+                            payload=payload,
+                        )
+
+                    # Fail job with non-zero exit code
+                    if return_code != 0:
+                        raise ReleaseException(
+                            message=fail_reason(robot_dir)
+                            or "".join([stderr.decode(), stdout.decode()]).strip(),
+                            code="",
+                            payload=payload,
+                        )
+
+                    # Fail job with retries when robot did not process its item
+                    if batch:
                         raise ItemReleaseWithFailure(
-                            release.exception.message or fail_reason(robot_dir),
-                            code=release.exception.code,
+                            f"Task {task} did not release work item of job {item.job.key}",
+                            code="NOT_RELEASED",
                             payload=payload,
                         )
 
-                # Fail job with non-zero exit code
-                if return_code != 0:
-                    raise ReleaseException(
-                        message=fail_reason(robot_dir)
-                        or "".join([stderr.decode(), stdout.decode()]).strip(),
-                        code="",
-                        payload=payload,
+                    return payload
+
+                outcomes = iter(
+                    await asyncio.gather(
+                        *[finish(i, item) for i, item in enumerate(items)],
+                        return_exceptions=True,
                     )
+                )
+                return [
+                    skipped[i] if i in skipped else next(outcomes)
+                    for i in range(len(items) + len(skipped))
+                ]
+            finally:
+                if preparing is not None:
+                    preparing.cancel()
+                    await asyncio.gather(preparing, return_exceptions=True)
+                # Cgroup of a failed or cancelled run must not be left behind
+                if cgroup is not None:
+                    await remove_cgroup(cgroup)
+
+    batcher = Batcher(execute_items)
+
+    async def profile_task(__job: Job, **kwargs):
+        # Jobs are profiled on request with a "profile" task header
+        if not __job.custom_headers.get("profile"):
+            return await execute_task(__job, **kwargs)
+        sampler = Sampler(
+            threading.get_ident(), lambda frame: frame_job_key(frame) == __job.key
+        )
+        sampler.start()
+        try:
+            return await execute_task(__job, **kwargs)
+        finally:
+            await asyncio.get_event_loop().run_in_executor(None, sampler.stop)
+            profile_key = "{}{}/{}/profile.collapsed".format(
+                key_prefix,
+                kwargs["__process_instance_key"],
+                kwargs["__element_instance_key"],
+            )
+            try:
+                await s3_put_object(
+                    create_s3_client(config),
+                    config.rcc_s3_bucket_logs,
+                    profile_key,
+                    sampler.collapsed().encode("utf-8"),
+                    "text/plain",
+                )
+                logger.info("Job %s profile saved to %s", __job.key, profile_key)
+            except Exception as e:
+                logger.warning("Job %s profile could not be saved: %s", __job.key, e)
 
-                return payload
+    return profile_task, task_config
 
-    return execute_task, task_config
 
+def unavailable(robot_task: RobotTask) -> Optional[str]:
+    """Return the service required by the task, which is unavailable."""
+    if s3_breaker.is_open:
+        return s3_breaker.name
+    if robot_task.vault and vault_breaker.is_open:
+        return vault_breaker.name
+    return None
 
-async def on_error(exception: Exception, job: Job):
+
+async def on_error(exception: Exception, job: Job, retry: Optional[RetryPolicy] = None):
     """
     on_error will be called when the task fails
     """
@@ -484,11 +1058,43 @@ async def on_error(exception: Exception, job: Job):
     elif isinstance(exception, ItemReleaseWithFailure):
         # RPA.Robocorp.WorkItems retryable application failure
         logger.error(str(exception))
-        job.variables = exception.payload
+        attempt = int(job.variables.get(ATTEMPT_VARIABLE) or 0)
+        job.variables = exception.payload | (
+            {ATTEMPT_VARIABLE: attempt + 1} if retry is not None else {}
+        )
         await job.zeebe_adapter.set_variables(
             job.element_instance_key, job.variables, True
         )
-        await job.set_failure_status(str(exception) or exception.code)
+        if retry is None:
+            await job.set_failure_status(str(exception) or exception.code)
+        else:
+            # Retry after backoff, unless the failure is not retryable
+            retries = (
+                retry.remaining(job.retries)
+                if retry.is_retryable(exception.code)
+                else 0
+            )
+            job.status = JobStatus.Failed
+            await job.zeebe_adapter.fail_job(
+                job_key=job.key,
+                retries=retries,
+                message=str(exception) or exception.code,
+                retry_back_off=retry.backoff(attempt) if retries else 0,
+            )
+    elif isinstance(exception, ServiceUnavailableError):
+        # S3 or Vault outage -> retry job without using its retries,
+        # once the breaker would let it through again
+        logger.warning("Job %s failed: %s", job.key, exception)
+        breaker = (
+            vault_breaker if exception.service == vault_breaker.name else s3_breaker
+        )
+        job.status = JobStatus.Failed
+        await job.zeebe_adapter.fail_job(
+            job_key=job.key,
+            retries=job.retries,
+            message=str(exception),
+            retry_back_off=int(breaker.interval * 1000),
+        )
     elif isinstance(exception, ReleaseException):
         # Robot Framework test / task failure -> fail job without retries
         logger.error(str(exception))
@@ -518,11 +1124,27 @@ class VariablesDict(dict):
         super().update(d)
 
 
+def record_job(recorder: Recorder):
+    async def record(job: Job) -> Job:
+        recorder.write(job_to_dict(job))
+        return job
+
+    return record
+
+
 async def before_job(job: Job) -> Job:
     # Ensure that job variables contain only the variables returned by the worker
     for name in list(job.variables.keys()):
         if "." in name:
             job.variables.pop(name)
+    job_context.set(
+        {
+            "jobKey": job.key,
+            "task": job.type,
+            "processInstanceKey": job.process_instance_key,
+            "elementInstanceKey": job.element_instance_key,
+        }
+    )
     logger.debug("Before job: %s", lazypprint(job_to_dict(job)))
     job.variables = VariablesDict(
         job.variables
@@ -587,8 +1209,142 @@ async def after_job(job: Job) -> Job:
     envvar="RCC_S3_URL_EXPIRES_IN",
     help="Amount of seconds after generated presigned URLs to download S3 stored files without further authorization expire.",
 )
+@click.option(
+    "--rcc-s3-redirect-url",
+    default="",
+    envvar="RCC_S3_REDIRECT_URL",
+    help="Public URL of the healthz server to return stable redirect links to S3 stored files instead of presigned URLs.",
+)
+@click.option(
+    "--rcc-s3-redirect-secret",
+    default="",
+    envvar="RCC_S3_REDIRECT_SECRET",
+    help="Secret for signing redirect links. Defaults to the S3 secret access key.",
+)
+@click.option(
+    "--rcc-s3-offload-threshold",
+    default=0,
+    envvar="RCC_S3_OFFLOAD_THRESHOLD",
+    help="Amount of bytes above which an output variable is stored in the data bucket and replaced with a reference. Disabled by default.",
+)
+@click.option(
+    "--rcc-s3-live-interval",
+    default=0,
+    envvar="RCC_S3_LIVE_INTERVAL",
+    help="Amount of seconds between uploads of new robot output and progress to the logs bucket while the robot runs. Disabled by default.",
+)
 @click.option("--rcc-telemetry", is_flag=True, default=False, envvar="RCC_TELEMETRY")
+@click.option(
+    "--robots-watch-interval",
+    default=0,
+    envvar="RCC_ROBOTS_WATCH_INTERVAL",
+    help="Amount of seconds between checks for added, changed or removed robot packages. Disabled by default.",
+)
+@click.option(
+    "--robots-cache-dir",
+    default="",
+    envvar="RCC_ROBOTS_CACHE_DIR",
+    help="Local directory for robot packages downloaded from S3 or snapshotted for watching, and for their manifest index.",
+)
+@click.option(
+    "--work-root",
+    default="",
+    envvar="WORK_ROOT",
+    help="Directory for job scratch files, e.g. on tmpfs or fast local disk. Defaults to the system temporary directory.",
+)
+@click.option(
+    "--work-quota-mb",
+    default=0,
+    envvar="WORK_QUOTA_MB",
+    help="Amount of megabytes of scratch files a single job may use before its robot is terminated. Unlimited by default.",
+)
+@click.option(
+    "--task-variables",
+    default="",
+    envvar="TASK_VARIABLES",
+    help='Variables to fetch for tasks as "Task A=var1,var2;Task B=var3". Overrides "variables" in robot.yaml. All variables are fetched by default.',
+)
+@click.option(
+    "--task-idempotent",
+    default="",
+    envvar="TASK_IDEMPOTENT",
+    help='Tasks, which are completed from the recorded result of their previous execution when re-delivered, as "Task A;Task B". Extends "idempotent" in robot.yaml.',
+)
+@click.option(
+    "--task-usage-variable",
+    default="",
+    envvar="TASK_USAGE_VARIABLE",
+    help="Name of the job variable to return the resource usage of robot runs in.",
+)
+@click.option(
+    "--task-limits",
+    default="",
+    envvar="TASK_LIMITS",
+    help='Resource limits of robot runs as "Task A=cpu=600,memory=2048,processes=100,files=1024;Task B=...", with cpu in seconds and memory in MB. Without --task-cgroup-root, only cpu and files are enforced, and they apply to each process separately. Extends "limits" in robot.yaml.',
+)
+@click.option(
+    "--task-retry",
+    default="",
+    envvar="TASK_RETRY",
+    help='Retry policies for retryable failures as "Task A=backoff=10000,max_backoff=600000,multiplier=2,jitter=0.2,retries=5,codes=TIMEOUT|NETWORK;Task B=...", with backoffs in milliseconds and the backoff 10000 by default. Failures with other codes are not retried. Extends "retry" in robot.yaml.',
+)
+@click.option(
+    "--task-batch",
+    default="",
+    envvar="TASK_BATCH",
+    help='Tasks, which execute up to size jobs as work items of a single robot run, as "Task A=10;Task B=20,1000", with an optional window in milliseconds to wait for more jobs. Extends "batch" in robot.yaml.',
+)
+@click.option(
+    "--task-cgroup-root",
+    default="",
+    envvar="TASK_CGROUP_ROOT",
+    help="Delegated cgroup v2 directory for enforcing cpu, memory and process limits of robot runs as limits of their whole process tree.",
+)
 @click.option("--task-timeout-ms", default=60 * 60 * 1000, envvar="TASK_TIMEOUT_MS")
+@click.option(
+    "--admission-min-memory-mb",
+    default=0,
+    envvar="ADMISSION_MIN_MEMORY_MB",
+    help="Start new jobs only while more memory is available on the node or cgroup.",
+)
+@click.option(
+    "--admission-max-load",
+    default=0.0,
+    envvar="ADMISSION_MAX_LOAD",
+    help="Start new jobs only while the 1 minute load average per CPU is lower.",
+)
+@click.option(
+    "--admission-min-disk-mb",
+    default=0,
+    envvar="ADMISSION_MIN_DISK_MB",
+    help="Start new jobs only while more disk is free on the work root.",
+)
+@click.option(
+    "--admission-history",
+    is_flag=True,
+    default=False,
+    envvar="ADMISSION_HISTORY",
+    help="Reserve memory for new jobs by the peak RSS recorded for their task.",
+)
+@click.option(
+    "--task-deadline-margin-ms",
+    default=30 * 1000,
+    envvar="TASK_DEADLINE_MARGIN_MS",
+    help="Amount of milliseconds before the job deadline when a still running robot is terminated.",
+)
+@click.option(
+    "--task-kill-grace-ms",
+    default=10 * 1000,
+    envvar="TASK_KILL_GRACE_MS",
+    help="Amount of milliseconds to wait for a terminated robot to exit before it is killed.",
+)
+@click.option(
+    "--task-prepare-early",
+    is_flag=True,
+    default=False,
+    envvar="TASK_PREPARE_EARLY",
+    help="Prepare robots for jobs already while they are waiting for a free slot.",
+)
 @click.option(
     "--task-max-jobs", default=multiprocessing.cpu_count(), envvar="TASK_MAX_JOBS"
 )
@@ -596,6 +1352,37 @@ async def after_job(job: Job) -> Job:
 @click.option("--vault-token", default="secret", envvar="VAULT_TOKEN")
 @click.option("--zeebe-hostname", default="localhost", envvar="ZEEBE_HOSTNAME")
 @click.option("--zeebe-port", default=26500, envvar="ZEEBE_PORT")
+@click.option(
+    "--zeebe-streaming",
+    is_flag=True,
+    default=False,
+    envvar="ZEEBE_STREAMING",
+    help="Receive jobs pushed by the gateway instead of polling, when supported.",
+)
+@click.option(
+    "--affinity-nodes",
+    default="",
+    envvar="AFFINITY_NODES",
+    help='Node ids of the worker fleet as "node-a,node-b", to assign robot environments to nodes with consistent hashing.',
+)
+@click.option(
+    "--affinity-node-id",
+    default=socket.gethostname(),
+    envvar="AFFINITY_NODE_ID",
+    help="Node id of this worker in --affinity-nodes.",
+)
+@click.option(
+    "--affinity-delay-ms",
+    default=5000,
+    envvar="AFFINITY_DELAY_MS",
+    help="Amount of milliseconds to delay polling jobs for robot environments, which are owned by other nodes and not yet used on this node.",
+)
+@click.option(
+    "--holotree-s3-prefix",
+    default="",
+    envvar="HOLOTREE_S3_PREFIX",
+    help="S3 prefix (s3://bucket/prefix/) to share built robot environments between nodes through.",
+)
 @click.option("--camunda-client-id", default="", envvar="CAMUNDA_CLIENT_ID")
 @click.option("--camunda-client-secret", default="", envvar="CAMUNDA_CLIENT_SECRET")
 @click.option("--camunda-cluster-id", default="", envvar="CAMUNDA_CLIENT_SECRET")
@@ -603,6 +1390,67 @@ async def after_job(job: Job) -> Job:
 @click.option("--healthz-hostname", default="", envvar="HEALTHZ_HOSTNAME")
 @click.option("--healthz-port", default=8001, envvar="HEALTHZ_PORT")
 @click.option("--log-level", default="info", envvar="LOG_LEVEL")
+@click.option(
+    "--log-format",
+    type=click.Choice(["text", "json"]),
+    default="text",
+    envvar="LOG_FORMAT",
+    help="Format of log messages, where json includes fields of the current job.",
+)
+@click.option(
+    "--loop-lag-threshold-ms",
+    default=1000,
+    envvar="LOOP_LAG_THRESHOLD_MS",
+    help="Milliseconds the event loop may be blocked before its stack is logged.",
+)
+@click.option(
+    "--debug-token",
+    default="",
+    envvar="DEBUG_TOKEN",
+    help="Bearer token, which enables debug endpoints on the healthz server.",
+)
+@click.option(
+    "--record",
+    default="",
+    envvar="RECORD",
+    help="Append activated jobs with their arrival times into this JSON lines file.",
+)
+@click.option(
+    "--record-redact",
+    default="*password*,*secret*,*token*",
+    envvar="RECORD_REDACT",
+    help="Comma separated patterns of variable names, which values are not recorded.",
+)
+@click.option(
+    "--replay",
+    default="",
+    envvar="REPLAY",
+    help="Execute jobs recorded into this file instead of jobs from Zeebe, and exit.",
+)
+@click.option(
+    "--replay-rate",
+    default=1.0,
+    envvar="REPLAY_RATE",
+    help="Multiplier for the recorded arrival rate of replayed jobs (0 for no delays).",
+)
+@click.option(
+    "--replay-s3-prefix",
+    default="replay",
+    envvar="REPLAY_S3_PREFIX",
+    help="Prefix for the keys of logs, results and files saved by replayed jobs in the S3 buckets.",
+)
+@click.option(
+    "--breaker-threshold",
+    default=3,
+    envvar="BREAKER_THRESHOLD",
+    help="Consecutive S3 or Vault failures before jobs requiring it are no longer activated (0 to disable).",
+)
+@click.option(
+    "--breaker-interval",
+    default=10,
+    envvar="BREAKER_INTERVAL",
+    help="Seconds between checks whether unavailable S3 or Vault has recovered.",
+)
 @click.option("--debug", is_flag=True, default=False, envvar="DEBUG")
 def main(
     robots,
@@ -617,13 +1465,40 @@ def main(
     rcc_s3_bucket_logs,
     rcc_s3_bucket_data,
     rcc_s3_url_expires_in,
+    rcc_s3_redirect_url,
+    rcc_s3_redirect_secret,
+    rcc_s3_offload_threshold,
+    rcc_s3_live_interval,
     rcc_telemetry,
+    robots_watch_interval,
+    robots_cache_dir,
+    work_root,
+    work_quota_mb,
+    task_variables,
+    task_idempotent,
+    task_usage_variable,
+    task_limits,
+    task_batch,
+    task_retry,
+    task_cgroup_root,
     task_timeout_ms,
+    admission_min_memory_mb,
+    admission_max_load,
+    admission_min_disk_mb,
+    admission_history,
+    task_deadline_margin_ms,
+    task_kill_grace_ms,
+    task_prepare_early,
     task_max_jobs,
     vault_addr,
     vault_token,
     zeebe_hostname,
     zeebe_port,
+    zeebe_streaming,
+    affinity_nodes,
+    affinity_node_id,
+    affinity_delay_ms,
+    holotree_s3_prefix,
     camunda_client_id,
     camunda_client_secret,
     camunda_cluster_id,
@@ -631,15 +1506,28 @@ def main(
     healthz_hostname,
     healthz_port,
     log_level,
+    log_format,
+    loop_lag_threshold_ms,
+    debug_token,
+    record,
+    record_redact,
+    replay,
+    replay_rate,
+    replay_s3_prefix,
+    breaker_threshold,
+    breaker_interval,
     debug,
 ):
     """Zeebe external task Robot Framework RCC client
 
     ROBOTS are RCC compatible automation code packages,
     which are most often created with `rcc robot wrap [-z robot.zip]`.
-    They can also be passed as a space separated env RCC_ROBOTS
+    They can also be passed as a space separated env RCC_ROBOTS.
+    ROBOTS may also be directories or S3 prefixes (s3://bucket/prefix/)
+    containing packages.
 
     """
+    timings = Timings()
     config = Options(
         business_key=business_key,
         rcc_executable=rcc_executable,
@@ -652,13 +1540,40 @@ def main(
         rcc_s3_bucket_logs=rcc_s3_bucket_logs,
         rcc_s3_bucket_data=rcc_s3_bucket_data,
         rcc_s3_url_expires_in=rcc_s3_url_expires_in,
+        rcc_s3_redirect_url=rcc_s3_redirect_url,
+        rcc_s3_redirect_secret=rcc_s3_redirect_secret,
+        rcc_s3_offload_threshold=rcc_s3_offload_threshold,
+        rcc_s3_live_interval=rcc_s3_live_interval,
         rcc_telemetry=rcc_telemetry,
+        robots_watch_interval=robots_watch_interval,
+        robots_cache_dir=robots_cache_dir,
+        work_root=work_root,
+        work_quota_mb=work_quota_mb,
+        task_variables=task_variables,
+        task_idempotent=task_idempotent,
+        task_usage_variable=task_usage_variable,
+        task_limits=task_limits,
+        task_batch=task_batch,
+        task_retry=task_retry,
+        task_cgroup_root=task_cgroup_root,
         task_timeout_ms=task_timeout_ms,
+        admission_min_memory_mb=admission_min_memory_mb,
+        admission_max_load=admission_max_load,
+        admission_min_disk_mb=admission_min_disk_mb,
+        admission_history=admission_history,
+        task_deadline_margin_ms=task_deadline_margin_ms,
+        task_kill_grace_ms=task_kill_grace_ms,
+        task_prepare_early=task_prepare_early,
         task_max_jobs=task_max_jobs,
         vault_addr=vault_addr,
         vault_token=vault_token,
         zeebe_hostname=zeebe_hostname,
         zeebe_port=zeebe_port,
+        zeebe_streaming=zeebe_streaming,
+        affinity_nodes=affinity_nodes,
+        affinity_node_id=affinity_node_id,
+        affinity_delay_ms=affinity_delay_ms,
+        holotree_s3_prefix=holotree_s3_prefix,
         healthz_hostname=healthz_hostname,
         healthz_port=healthz_port,
         camunda_client_id=camunda_client_id,
@@ -667,31 +1582,47 @@ def main(
         camunda_region=camunda_region,
         log_level=LogLevel(log_level) if not debug else LogLevel("debug"),
         debug=debug,
+        log_format=log_format,
+        loop_lag_threshold_ms=loop_lag_threshold_ms,
+        debug_token=debug_token,
+        record=record,
+        record_redact=record_redact,
+        replay=replay,
+        replay_rate=replay_rate,
+        replay_s3_prefix=replay_s3_prefix,
+        breaker_threshold=breaker_threshold,
+        breaker_interval=breaker_interval,
     )
+    if config.rcc_s3_redirect_url and not config.healthz_hostname:
+        raise click.UsageError(
+            "--rcc-s3-redirect-url requires --healthz-hostname to serve the redirects"
+        )
 
-    setup_logging(logger, config.log_level, debug)
+    setup_logging(
+        logging.getLogger("parrot_rcc"), config.log_level, debug, config.log_format
+    )
     logger.info(
         dataclasses.replace(
             config,
             vault_token="*" * 8,
             camunda_client_secret="*" * 8,
+            debug_token="*" * 8,
             rcc_s3_access_key_id="*" * 8,
             rcc_s3_secret_access_key="*" * 8,
+            rcc_s3_redirect_secret="*" * 8,
         )
     )
 
+    timings.mark("config")
+
     if len(robots) == 1 and "," in robots[0]:
         robots = [x.strip() for x in robots[0].split(",")]
 
-    tasks = {}
-    for robot in robots:
-        robot = Path(robot)
-        if not robot.exists():
-            continue
-        with ZipFile(robot, "r") as fp:
-            robot_yaml = yaml.safe_load(fp.read("robot.yaml"))
-            for task in robot_yaml.get("tasks") or {}:
-                tasks[task] = robot.resolve(), robot_yaml.get("vault") or {}
+    loop = asyncio.get_event_loop()
+    robots = Robots(robots, config, snapshot=config.robots_watch_interval > 0)
+    loop.run_until_complete(robots.refresh())
+    tasks = robots.tasks
+    timings.mark("robots")
 
     if config.insecure:
         channel = create_insecure_channel(
@@ -706,21 +1637,61 @@ def main(
             region=config.camunda_region,
         )
 
-    worker = ZeebeWorker(channel)
+    # Free disk is checked on the file system of the job directories
+    workspace = Workspace(config.work_root, config.work_quota_mb)
+    slots = Slots(
+        config.task_max_jobs,
+        str(workspace.root),
+        config.admission_min_memory_mb,
+        config.admission_max_load,
+        config.admission_min_disk_mb,
+        task_usage if config.admission_history else None,
+    )
+    if config.affinity_nodes:
+        affinity.configure(
+            [node.strip() for node in config.affinity_nodes.split(",") if node.strip()],
+            config.affinity_node_id,
+            config.affinity_delay_ms,
+            robots.cache_dir / "environments.json",
+        )
+    if config.holotree_s3_prefix:
+        holotrees.configure(config.holotree_s3_prefix, config.rcc_executable)
+    s3_breaker.configure(
+        functools.partial(s3_probe, config),
+        config.breaker_threshold,
+        config.breaker_interval,
+    )
+    vault_breaker.configure(
+        functools.partial(vault_probe, config),
+        config.breaker_threshold,
+        config.breaker_interval,
+    )
+    worker = Worker(
+        channel,
+        streaming=config.zeebe_streaming,
+        slots=slots,
+        paused=lambda task: task in robots.tasks and bool(unavailable(robots[task])),
+        delay=lambda task: (
+            affinity.delay(robots[task].robot) if task in robots.tasks else 0
+        ),
+    )
     worker.zeebe_adapter.__class__.__bases__ = (
-        worker.zeebe_adapter.__class__.__bases__ + (ZeebeVariablesAdapter,)
+        # Retry backoff must override fail_job of the original adapter
+        (ZeebeRetryAdapter,)
+        + worker.zeebe_adapter.__class__.__bases__
+        + (ZeebeVariablesAdapter,)
     )
-    semaphore = asyncio.Semaphore(config.task_max_jobs)
+    workspace.start()
 
-    for task, (robot, vault) in tasks.items():
-        worker._add_task(
+    for task in tasks:
+        worker.add_task(
             task_builder.build_task(
-                *create_task(task, str(robot), vault, semaphore, config)
+                *create_task(task, robots, slots, workspace, config)
             )
         )
+    timings.mark("worker")
 
-    loop = asyncio.get_event_loop()
-    if tasks:
+    if tasks or config.robots_watch_interval:
         logger.info("Tasks: %s", lazypprint(tasks))
         return_code, stdout, stderr = loop.run_until_complete(
             run(
@@ -731,14 +1702,37 @@ def main(
             )
         )
         assert return_code == 0, lazydecode(stderr)
+        timings.mark("identity")
+        monitor = LoopMonitor(threshold=config.loop_lag_threshold_ms / 1000)
+        monitor.start(loop)
         if config.healthz_hostname:
-            runner = aiohttp.web.AppRunner(healthz_app(config))
+            from aiohttp import web
+            from parrot_rcc.healthz import app as healthz_app
+
+            runner = web.AppRunner(healthz_app(config, monitor))
             loop.run_until_complete(runner.setup())
-            site = aiohttp.web.TCPSite(
+            site = web.TCPSite(
                 runner, host=config.healthz_hostname, port=config.healthz_port
             )
             loop.run_until_complete(site.start())
-            loop.run_until_complete(worker.work())
+            timings.mark("healthz")
+        logger.info("Startup: %s", timings)
+        loop.run_in_executor(None, preload, "boto3", "aiohttp", "magic", "PIL.Image")
+        if config.replay:
+            loop.run_until_complete(
+                replay_jobs(
+                    config.replay,
+                    {task.type: task for task in worker.tasks},
+                    config.replay_rate,
+                )
+            )
+        elif config.robots_watch_interval:
+            loop.run_until_complete(
+                asyncio.gather(
+                    worker.work(),
+                    watch_robots(robots, worker, slots, workspace, config),
+                )
+            )
         else:
             loop.run_until_complete(worker.work())
     else:
@@ -746,6 +1740,44 @@ def main(
         loop.run_until_complete(sleep(3))
 
 
+async def watch_robots(
+    robots: Robots,
+    worker: Worker,
+    slots: Slots,
+    workspace: Workspace,
+    config: Options,
+):
+    while True:
+        await asyncio.sleep(config.robots_watch_interval)
+        try:
+            added, changed, removed = await robots.refresh()
+        except Exception as e:
+            logger.warning("Robot packages could not be refreshed: %s", e)
+            continue
+        for task in removed:
+            # Running jobs of removed tasks are allowed to finish
+            logger.info("Removing task: %s", task)
+            asyncio.ensure_future(worker.discard_task(task))
+        for task in changed:
+            logger.info("Updating task: %s", lazypprint(robots[task]))
+            task_config = worker.get_task(task).config
+            task_config.variables_to_fetch = variables_to_fetch(robots[task], config)
+            # Batch size of the new version changes the amount of jobs to activate
+            task_config.max_jobs_to_activate = (
+                config.task_max_jobs * robots[task].batch_size
+            )
+            task_config.max_running_jobs = (
+                config.task_max_jobs * robots[task].batch_size
+            )
+        for task in added:
+            logger.info("Adding task: %s", lazypprint(robots[task]))
+            worker.add_task(
+                task_builder.build_task(
+                    *create_task(task, robots, slots, workspace, config)
+                )
+            )
+
+
 async def sleep(timeout: int):
     return await asyncio.sleep(timeout)
 
@@ -1,5 +1,7 @@
+from parrot_rcc.retry import RetryPolicy
 from pyzeebe.errors import PyZeebeError
 from typing import Dict
+from typing import Optional
 
 
 class ElementInstanceNotFoundError(PyZeebeError):
@@ -9,10 +11,17 @@ class ElementInstanceNotFoundError(PyZeebeError):
 
 
 class ReleaseException(Exception):
-    def __init__(self, message: str, code: str, payload: Dict):
+    def __init__(
+        self,
+        message: str,
+        code: str,
+        payload: Dict,
+        retry: Optional[RetryPolicy] = None,
+    ):
         super().__init__(message)
         self.code = code
         self.payload = payload
+        self.retry = retry
 
 
 class ItemReleaseWithBusinessError(ReleaseException):
@@ -21,3 +30,32 @@ class ItemReleaseWithBusinessError(ReleaseException):
 
 class ItemReleaseWithFailure(ReleaseException):
     pass
+
+
+class ServiceUnavailableError(Exception):
+    def __init__(self, service: str):
+        super().__init__(f"{service} is unavailable")
+        self.service = service
+
+
+class LimitUnavailableError(Exception):
+    pass
+
+
+class RunTerminatedError(Exception):
+    def __init__(self, message: str, return_code: int, stdout: bytes, stderr: bytes):
+        super().__init__(message)
+        self.return_code = return_code
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class RunTimeoutError(RunTerminatedError):
+    def __init__(self, timeout: float, return_code: int, stdout: bytes, stderr: bytes):
+        super().__init__(
+            f"Process was terminated after {timeout:.0f} seconds",
+            return_code,
+            stdout,
+            stderr,
+        )
+        self.timeout = timeout
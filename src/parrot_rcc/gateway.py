@@ -0,0 +1,250 @@
+"""In-process fake Zeebe gateway for exercising the worker without a broker.
+
+Usage: python -m parrot_rcc.gateway [--port PORT] [--no-streaming] JOBS.jsonl
+
+Jobs are read from a JSON lines file with "type", "variables" and
+optional "customHeaders" on each line. Like with Zeebe, jobs are offered
+again after their activation timeout, and failed jobs with retries left
+after their retry backoff.
+"""
+from parrot_rcc.streaming import decode_stream_request
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from zeebe_grpc import gateway_pb2
+import asyncio
+import grpc
+import itertools
+import json
+import logging
+import sys
+import time
+
+
+logger = logging.getLogger(__name__)
+
+SERVICE = "gateway_protocol.Gateway"
+
+
+class FakeGateway:
+    """Gateway serving queued jobs through ActivateJobs and StreamActivatedJobs.
+
+    Outcomes reported by the worker are collected into completed, failed
+    and errors by job key. Workers are identified by their name in workers.
+    """
+
+    def __init__(self, streaming: bool = True):
+        self.streaming = streaming
+        self.jobs: Dict[str, List[gateway_pb2.ActivatedJob]] = {}
+        self.completed: Dict[int, Dict] = {}
+        self.failed: Dict[int, gateway_pb2.FailJobRequest] = {}
+        self.errors: Dict[int, gateway_pb2.ThrowErrorRequest] = {}
+        self.variables: Dict[int, Dict] = {}
+        self.workers: Dict[int, List[str]] = {}
+        self.activations = 0
+        self.streamed = 0
+        self._keys = itertools.count(1)
+        self._available = asyncio.Condition()
+        self._active: Dict[int, gateway_pb2.ActivatedJob] = {}
+        self._retrying: Set[asyncio.Future] = set()
+        self._server: Optional[grpc.aio.Server] = None
+        self._expiring: Optional[asyncio.Future] = None
+
+    async def add_job(
+        self, task_type: str, variables: Dict, custom_headers: Optional[Dict] = None
+    ) -> int:
+        key = next(self._keys)
+        job = gateway_pb2.ActivatedJob(
+            key=key,
+            type=task_type,
+            processInstanceKey=key,
+            bpmnProcessId="fake-process",
+            processDefinitionVersion=1,
+            processDefinitionKey=1,
+            elementId="fake-task",
+            elementInstanceKey=key,
+            customHeaders=json.dumps(custom_headers or {}),
+            retries=3,
+            variables=json.dumps(variables),
+        )
+        await self.requeue(job)
+        return key
+
+    async def requeue(self, job: gateway_pb2.ActivatedJob, delay: float = 0):
+        await asyncio.sleep(delay)
+        async with self._available:
+            self.jobs.setdefault(job.type, []).append(job)
+            self._available.notify_all()
+
+    async def expire(self, interval: float = 0.1):
+        while True:
+            await asyncio.sleep(interval)
+            now = int(time.time() * 1000)
+            for key, job in list(self._active.items()):
+                if job.deadline < now:
+                    logger.info("Job %s timed out", key)
+                    del self._active[key]
+                    await self.requeue(job)
+
+    def _activate(self, task_type: str, worker: str, timeout: int, max_jobs: int):
+        queued = self.jobs.get(task_type) or []
+        activated, self.jobs[task_type] = queued[:max_jobs], queued[max_jobs:]
+        for job in activated:
+            # Local variables set for the element are activated with its job
+            job.variables = json.dumps(
+                json.loads(job.variables)
+                | self.variables.get(job.elementInstanceKey, {})
+            )
+            job.worker = worker
+            job.deadline = int(time.time() * 1000) + timeout
+            self._active[job.key] = job
+            self.workers.setdefault(job.key, []).append(worker)
+        self.activations += len(activated)
+        return activated
+
+    async def ActivateJobs(self, request, context):
+        async with self._available:
+            jobs = self._activate(
+                request.type, request.worker, request.timeout, request.maxJobsToActivate
+            )
+            if not jobs and request.requestTimeout >= 0:
+                # Long polling
+                try:
+                    await asyncio.wait_for(
+                        self._available.wait(), (request.requestTimeout or 1000) / 1000
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                jobs = self._activate(
+                    request.type,
+                    request.worker,
+                    request.timeout,
+                    request.maxJobsToActivate,
+                )
+        if jobs:
+            yield gateway_pb2.ActivateJobsResponse(jobs=jobs)
+
+    async def StreamActivatedJobs(self, request: bytes, context):
+        request = decode_stream_request(request)
+        while True:
+            async with self._available:
+                jobs = self._activate(
+                    request["type"], request["worker"], request["timeout"], 1
+                )
+                if not jobs:
+                    await self._available.wait()
+                    continue
+            self.streamed += 1
+            yield jobs[0]
+
+    async def deactivate(self, job_key: int, context) -> gateway_pb2.ActivatedJob:
+        if job_key not in self._active:
+            await context.abort(
+                grpc.StatusCode.NOT_FOUND, f"Job {job_key} is not activated"
+            )
+        return self._active.pop(job_key)
+
+    async def CompleteJob(self, request, context):
+        await self.deactivate(request.jobKey, context)
+        self.completed[request.jobKey] = json.loads(request.variables or "{}")
+        return gateway_pb2.CompleteJobResponse()
+
+    async def FailJob(self, request, context):
+        job = await self.deactivate(request.jobKey, context)
+        self.failed[request.jobKey] = request
+        if request.retries > 0:
+            job.retries = request.retries
+            retrying = asyncio.ensure_future(
+                self.requeue(job, request.retryBackOff / 1000)
+            )
+            self._retrying.add(retrying)
+            retrying.add_done_callback(self._retrying.discard)
+        return gateway_pb2.FailJobResponse()
+
+    async def ThrowError(self, request, context):
+        await self.deactivate(request.jobKey, context)
+        self.errors[request.jobKey] = request
+        return gateway_pb2.ThrowErrorResponse()
+
+    async def SetVariables(self, request, context):
+        self.variables.setdefault(request.elementInstanceKey, {}).update(
+            json.loads(request.variables)
+        )
+        return gateway_pb2.SetVariablesResponse()
+
+    async def Topology(self, request, context):
+        return gateway_pb2.TopologyResponse(clusterSize=1, partitionsCount=1)
+
+    def handler(self) -> grpc.GenericRpcHandler:
+        def unary(method, request):
+            return grpc.unary_unary_rpc_method_handler(
+                method,
+                request_deserializer=request.FromString,
+                response_serializer=lambda response: response.SerializeToString(),
+            )
+
+        handlers = {
+            "ActivateJobs": grpc.unary_stream_rpc_method_handler(
+                self.ActivateJobs,
+                request_deserializer=gateway_pb2.ActivateJobsRequest.FromString,
+                response_serializer=lambda response: response.SerializeToString(),
+            ),
+            "CompleteJob": unary(self.CompleteJob, gateway_pb2.CompleteJobRequest),
+            "FailJob": unary(self.FailJob, gateway_pb2.FailJobRequest),
+            "ThrowError": unary(self.ThrowError, gateway_pb2.ThrowErrorRequest),
+            "SetVariables": unary(self.SetVariables, gateway_pb2.SetVariablesRequest),
+            "Topology": unary(self.Topology, gateway_pb2.TopologyRequest),
+        }
+        if self.streaming:
+            handlers["StreamActivatedJobs"] = grpc.unary_stream_rpc_method_handler(
+                self.StreamActivatedJobs,
+                request_deserializer=lambda request: request,
+                response_serializer=lambda response: response.SerializeToString(),
+            )
+        return grpc.method_handlers_generic_handler(SERVICE, handlers)
+
+    async def start(self, port: int = 0) -> int:
+        self._server = grpc.aio.server()
+        self._server.add_generic_rpc_handlers((self.handler(),))
+        port = self._server.add_insecure_port(f"127.0.0.1:{port}")
+        await self._server.start()
+        self._expiring = asyncio.ensure_future(self.expire())
+        return port
+
+    async def stop(self):
+        if self._expiring is not None:
+            self._expiring.cancel()
+        for retrying in self._retrying:
+            retrying.cancel()
+        if self._server is not None:
+            await self._server.stop(None)
+
+
+async def serve(path: str, port: int, streaming: bool):
+    gateway = FakeGateway(streaming=streaming)
+    port = await gateway.start(port)
+    logger.info("Fake gateway listening on 127.0.0.1:%s", port)
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            if line.strip():
+                data = json.loads(line)
+                await gateway.add_job(
+                    data["type"], data.get("variables") or {}, data.get("customHeaders")
+                )
+    while True:
+        await asyncio.sleep(10)
+        logger.info(
+            "Activated %s jobs: %s completed, %s failed, %s errors",
+            gateway.activations,
+            len(gateway.completed),
+            len(gateway.failed),
+            len(gateway.errors),
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    port = int(args[args.index("--port") + 1]) if "--port" in args else 26500
+    asyncio.run(serve(args[-1], port, "--no-streaming" not in args))
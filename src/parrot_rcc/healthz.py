@@ -1,26 +1,145 @@
 from aiohttp import web
 from parrot_rcc.adapter import ZeebeTopologyAdapter
+from parrot_rcc.jobs import jobs as running_jobs
+from parrot_rcc.links import PresignedURLs
+from parrot_rcc.links import redirect_secret
+from parrot_rcc.links import sign
+from parrot_rcc.metrics import metrics
+from parrot_rcc.monitor import LoopMonitor
+from parrot_rcc.profiler import profile
+from parrot_rcc.s3 import create_s3_client
+from parrot_rcc.s3 import s3_generate_presigned_url
+from parrot_rcc.s3 import s3_put_object
 from parrot_rcc.types import Options
 from pyzeebe import create_camunda_cloud_channel
 from pyzeebe import create_insecure_channel
 from pyzeebe import ZeebeClient
+from typing import Any
+from typing import Optional
 import aiohttp
 import asyncio
+import functools
+import hmac
+import os
+import time
 
 
 class Healthz:
-    def __init__(self, client: ZeebeClient):
+    def __init__(
+        self,
+        client: ZeebeClient,
+        config: Options,
+        monitor: Optional[LoopMonitor] = None,
+    ):
         self.client = client
+        self.config = config
+        self.monitor = monitor
+        self._profiling = asyncio.Lock()
+        self._urls = PresignedURLs()
+
+    @functools.cached_property
+    def s3_client(self) -> Any:
+        return create_s3_client(self.config)
 
     async def healthz(self, request: web.Request) -> web.Response:
+        loop = (
+            {"loopLag": self.monitor.lag, "loopLagMax": self.monitor.max_lag}
+            if self.monitor
+            else {}
+        )
         try:
             await self.client.zeebe_adapter.topology()
-            return web.json_response({"status": "ok"})
+            return web.json_response({"status": "ok"} | loop)
         except Exception as e:
-            return web.json_response({"status": "error", "error": str(e)}, status=500)
+            return web.json_response(
+                {"status": "error", "error": str(e)} | loop, status=500
+            )
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain")
+
+    async def s3_redirect(self, request: web.Request) -> web.Response:
+        bucket, key = request.match_info["bucket"], request.match_info["key"]
+        if bucket not in (
+            self.config.rcc_s3_bucket_logs,
+            self.config.rcc_s3_bucket_data,
+        ):
+            raise web.HTTPNotFound()
+        if not hmac.compare_digest(
+            request.query.get("token", ""),
+            sign(redirect_secret(self.config), bucket, key),
+        ):
+            raise web.HTTPForbidden()
+        raise web.HTTPFound(await self._urls.get(self.s3_client, bucket, key))
+
+    async def jobs(self, request: web.Request) -> web.Response:
+        if not authorized(request, self.config.debug_token):
+            raise web.HTTPUnauthorized()
+        return web.json_response(running_jobs.as_list())
+
+    async def cancel_job(self, request: web.Request) -> web.Response:
+        if not authorized(request, self.config.debug_token):
+            raise web.HTTPUnauthorized()
+        try:
+            key = int(request.match_info["key"])
+        except ValueError:
+            raise web.HTTPBadRequest(text="Job key must be a number")
+        reason = request.query.get("reason") or "cancelled by an operator"
+        if key in running_jobs and running_jobs.jobs[key].phase == "saving":
+            raise web.HTTPConflict(text=f"Robot run of job {key} has already ended")
+        if not running_jobs.cancel(key, reason):
+            raise web.HTTPNotFound(text=f"Job {key} is not running on this worker")
+        running = running_jobs.jobs.get(key)
+        return web.json_response(
+            running.as_dict() if running else {"jobKey": key, "cancelled": reason},
+            status=202,
+        )
+
+    async def profile(self, request: web.Request) -> web.Response:
+        if not authorized(request, self.config.debug_token):
+            raise web.HTTPUnauthorized()
+        mode = request.query.get("mode", "sample")
+        if mode not in ("sample", "cprofile"):
+            raise web.HTTPBadRequest(text="Mode must be sample or cprofile")
+        try:
+            seconds = min(float(request.query.get("seconds", 10)), 300)
+        except ValueError:
+            raise web.HTTPBadRequest(text="Seconds must be a number")
+        if self._profiling.locked():
+            raise web.HTTPConflict(text="Profiling is already in progress")
+        async with self._profiling:
+            data, extension = await profile(seconds, mode)
+        filename = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.{extension}"
+        if request.query.get("upload"):
+            key = f"profiles/{filename}"
+            await s3_put_object(
+                self.s3_client,
+                self.config.rcc_s3_bucket_logs,
+                key,
+                data,
+                "application/octet-stream",
+            )
+            url = await s3_generate_presigned_url(
+                self.s3_client,
+                self.config.rcc_s3_bucket_logs,
+                key,
+                self.config.rcc_s3_url_expires_in,
+            )
+            return web.json_response({"key": key, "url": url})
+        return web.Response(
+            body=data,
+            content_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+
+def authorized(request: web.Request, token: str) -> bool:
+    return bool(token) and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    )
 
 
-def app(config: Options) -> web.Application:
+def app(config: Options, monitor: Optional[LoopMonitor] = None) -> web.Application:
     if config.insecure:
         channel = create_insecure_channel(
             hostname=config.zeebe_hostname,
@@ -38,5 +157,23 @@ def app(config: Options) -> web.Application:
         client.zeebe_adapter.__class__.__bases__ + (ZeebeTopologyAdapter,)
     )
     healthz_app = web.Application()
-    healthz_app.add_routes([web.get("/healthz", Healthz(client).healthz)])
+    healthz = Healthz(client, config, monitor)
+    healthz_app.add_routes(
+        [
+            web.get("/healthz", healthz.healthz),
+            web.get("/metrics", healthz.metrics),
+        ]
+    )
+    if config.rcc_s3_redirect_url:
+        # Client is created before serving to keep it off the request path
+        healthz.s3_client
+        healthz_app.add_routes([web.get("/s3/{bucket}/{key:.+}", healthz.s3_redirect)])
+    if config.debug_token:
+        healthz_app.add_routes(
+            [
+                web.get("/debug/profile", healthz.profile),
+                web.get("/jobs", healthz.jobs),
+                web.post("/jobs/{key}/cancel", healthz.cancel_job),
+            ]
+        )
     return healthz_app
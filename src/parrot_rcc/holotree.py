@@ -0,0 +1,131 @@
+from parrot_rcc.affinity import environment_hash
+from parrot_rcc.s3 import s3_download_file
+from parrot_rcc.s3 import s3_list_files
+from parrot_rcc.s3 import s3_upload_file
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Set
+from typing import Tuple
+from zipfile import ZipFile
+import asyncio
+import logging
+import tempfile
+import yaml
+
+
+logger = logging.getLogger(__name__)
+
+
+async def rcc(rcc_executable: str, *args: str, cwd: str) -> Tuple[int, bytes]:
+    proc = await asyncio.create_subprocess_exec(
+        rcc_executable,
+        *args,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    output, _ = await proc.communicate()
+    return proc.returncode, output
+
+
+class Holotrees:
+    """Share built holotree environments of robots between nodes through S3.
+
+    An environment is imported from S3 before its first use on this node.
+    After its first successful use, it is exported to S3, unless it was
+    already there. Both are attempted once per environment and process.
+    """
+
+    def __init__(self):
+        self.url = ""
+        self.rcc_executable = "rcc"
+        self._imported: Set[str] = set()
+        self._exported: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._exports: Set[asyncio.Future] = set()
+
+    def configure(self, url: str, rcc_executable: str):
+        self.url = url
+        self.rcc_executable = rcc_executable
+
+    def location(self, environment: str) -> Tuple[str, str]:
+        bucket, prefix = (self.url[len("s3://") :].split("/", 1) + [""])[:2]
+        return bucket, f"{prefix.strip('/')}/{environment}.zip".lstrip("/")
+
+    async def exists(self, s3_resource: Any, environment: str) -> bool:
+        bucket, key = self.location(environment)
+        return key in await s3_list_files(s3_resource, bucket, key)
+
+    async def prepare(self, s3_client: Any, s3_resource: Any, robot: str):
+        """Import the environment of the robot, when available in S3."""
+        environment = environment_hash(robot)
+        if not self.url or not environment or environment in self._imported:
+            return
+        async with self._locks.setdefault(environment, asyncio.Lock()):
+            if environment in self._imported:
+                return
+            self._imported.add(environment)
+            try:
+                if not await self.exists(s3_resource, environment):
+                    return
+                # Environment needs no export when it was imported
+                self._exported.add(environment)
+                with tempfile.TemporaryDirectory() as tmp:
+                    zip_path = str(Path(tmp) / "hololib.zip")
+                    await s3_download_file(
+                        s3_client, *self.location(environment), zip_path
+                    )
+                    return_code, output = await rcc(
+                        self.rcc_executable, "holotree", "import", zip_path, cwd=tmp
+                    )
+                assert return_code == 0, output.decode(errors="replace")
+                logger.info("Environment %s was imported from S3", environment)
+            except Exception as e:
+                logger.warning(
+                    "Environment %s could not be imported: %s", environment, e
+                )
+
+    def built(self, s3_client: Any, s3_resource: Any, robot: str):
+        """Export the environment of the robot in the background."""
+        environment = environment_hash(robot)
+        if not self.url or not environment or environment in self._exported:
+            return
+        self._exported.add(environment)
+        exporting = asyncio.ensure_future(
+            self.export(s3_client, s3_resource, robot, environment)
+        )
+        self._exports.add(exporting)
+        exporting.add_done_callback(self._exports.discard)
+
+    async def export(
+        self, s3_client: Any, s3_resource: Any, robot: str, environment: str
+    ):
+        try:
+            if await self.exists(s3_resource, environment):
+                return
+            with tempfile.TemporaryDirectory() as tmp:
+                # Only robot.yaml and its conda.yaml are required for the export
+                with ZipFile(robot, "r") as fp:
+                    robot_yaml = yaml.safe_load(fp.read("robot.yaml")) or {}
+                    fp.extract("robot.yaml", tmp)
+                    fp.extract(robot_yaml.get("condaConfigFile") or "conda.yaml", tmp)
+                zip_path = str(Path(tmp) / "hololib.zip")
+                return_code, output = await rcc(
+                    self.rcc_executable,
+                    "holotree",
+                    "export",
+                    "--robot",
+                    str(Path(tmp) / "robot.yaml"),
+                    "--zipfile",
+                    zip_path,
+                    cwd=tmp,
+                )
+                assert return_code == 0, output.decode(errors="replace")
+                await s3_upload_file(s3_client, zip_path, *self.location(environment))
+            logger.info("Environment %s was exported to S3", environment)
+        except Exception as e:
+            logger.warning("Environment %s could not be exported: %s", environment, e)
+
+
+holotrees = Holotrees()
@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from dataclasses import field
+from pyzeebe import Job
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+import asyncio
+import time
+
+
+@dataclass
+class RunningJob:
+    key: int
+    task: str
+    process_instance_key: int
+    element_instance_key: int
+    started: float = field(default_factory=time.time)
+    phase: str = "waiting"
+    space: str = ""
+    cancelled: Optional[str] = None
+    stop: Optional[asyncio.Event] = None
+    future: Optional[asyncio.Future] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "jobKey": self.key,
+            "task": self.task,
+            "processInstanceKey": self.process_instance_key,
+            "elementInstanceKey": self.element_instance_key,
+            "space": self.space,
+            "phase": self.phase,
+            "elapsed": round(time.time() - self.started, 3),
+            "cancelled": self.cancelled,
+        }
+
+
+class JobRegistry:
+    """Jobs in flight on this worker, which can be cancelled.
+
+    Cancelling a job with a running robot terminates the robot, which
+    cancels all the jobs of its batch. Otherwise the job is cancelled
+    at once. Jobs are not cancelled once their robot has been run, to not
+    lose the results being saved.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[int, RunningJob] = {}
+
+    @contextmanager
+    def track(self, job: Job) -> Iterator[RunningJob]:
+        running = RunningJob(
+            job.key, job.type, job.process_instance_key, job.element_instance_key
+        )
+        running.future = asyncio.current_task()
+        self.jobs[job.key] = running
+        try:
+            yield running
+        finally:
+            self.jobs.pop(job.key, None)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.jobs
+
+    def update(self, keys: List[int], **kwargs):
+        for key in keys:
+            if key in self.jobs:
+                for name, value in kwargs.items():
+                    setattr(self.jobs[key], name, value)
+
+    def cancelled(self, key: int) -> Optional[str]:
+        return self.jobs[key].cancelled if key in self.jobs else None
+
+    def cancel(self, key: int, reason: str) -> bool:
+        running = self.jobs.get(key)
+        if running is None or running.phase == "saving":
+            return False
+        running.cancelled = reason
+        if running.stop is not None:
+            running.stop.set()
+        elif running.future is not None:
+            running.future.cancel()
+        return True
+
+    def as_list(self) -> List[Dict]:
+        return [running.as_dict() for running in self.jobs.values()]
+
+
+jobs = JobRegistry()
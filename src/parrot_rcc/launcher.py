@@ -0,0 +1,78 @@
+"""Run a command and record the resource usage of its process tree.
+
+Usage: python launcher.py [--usage PATH] [--cgroup PATH] [--rlimit NAME=SOFT:HARD]...
+                          -- PROGRAM [ARGS...]
+
+The launcher is run by path with the worker's interpreter and must only
+depend on the standard library.
+"""
+import json
+import os
+import resource
+import signal
+import sys
+import time
+
+
+# Exit code when limits could not be applied before starting the command
+LIMITS_FAILED = 125
+
+
+def main(argv):
+    split = argv.index("--")
+    options, command = argv[:split], argv[split + 1 :]
+    usage_path = options[options.index("--usage") + 1] if "--usage" in options else ""
+
+    # Limits are inherited by the whole process tree of the command
+    try:
+        if "--cgroup" in options:
+            cgroup_path = options[options.index("--cgroup") + 1]
+            with open(os.path.join(cgroup_path, "cgroup.procs"), "w") as fp:
+                fp.write(f"{os.getpid()}")
+        for idx, option in enumerate(options):
+            if option == "--rlimit":
+                name, value = options[idx + 1].split("=", 1)
+                soft, _, hard = value.partition(":")
+                limit = getattr(resource, f"RLIMIT_{name}")
+                resource.setrlimit(limit, (int(soft), int(hard or soft)))
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"Limits could not be applied: {e}", file=sys.stderr)
+        return LIMITS_FAILED
+
+    # Termination is left to the command to get its usage recorded
+    signal.signal(signal.SIGTERM, lambda signum, frame: None)
+
+    started = time.monotonic()
+    try:
+        pid = os.posix_spawnp(command[0], command, os.environ)
+    except OSError as e:
+        print(f"{command[0]}: {e}", file=sys.stderr)
+        return 127
+    _, status, rusage = os.wait4(pid, 0)
+    wall = time.monotonic() - started
+
+    if usage_path:
+        # Usage includes descendants waited for by the command
+        usage = {
+            "wall": round(wall, 3),
+            "user": round(rusage.ru_utime, 3),
+            "system": round(rusage.ru_stime, 3),
+            "maxrss": rusage.ru_maxrss * 1024,
+            "inblock": rusage.ru_inblock,
+            "oublock": rusage.ru_oublock,
+        }
+        with open(f"{usage_path}.part", "w", encoding="utf-8") as fp:
+            fp.write(json.dumps(usage))
+        os.rename(f"{usage_path}.part", usage_path)
+
+    code = os.waitstatus_to_exitcode(status)
+    if code < 0:
+        # Exit like the command, when it was killed by a signal
+        if -code != signal.SIGKILL:
+            signal.signal(-code, signal.SIG_DFL)
+        os.kill(os.getpid(), -code)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
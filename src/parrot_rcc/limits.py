@@ -0,0 +1,165 @@
+from parrot_rcc.errors import LimitUnavailableError
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Limit names with their rlimit resources, which apply to each process
+# of the robot separately. CPU time of the whole robot is limited only
+# with a cgroup.
+RLIMITS = {
+    "cpu": "CPU",  # seconds
+    "files": "NOFILE",
+}
+
+# Limits of the whole robot, which can only be enforced with a cgroup
+CGROUP_LIMITS = ("cpu", "memory", "processes")
+
+# Seconds between SIGXCPU and SIGKILL for a process exceeding its CPU time
+CPU_KILL_GRACE = 5
+
+# Error messages printed when a limit prevents the robot from continuing
+MESSAGES = {
+    "cpu": [b"CPU time limit exceeded"],
+    "memory": [b"MemoryError", b"Cannot allocate memory"],
+    "processes": [b"Resource temporarily unavailable"],
+    "files": [b"Too many open files"],
+}
+
+
+def parse_limits(value: str) -> Dict[str, int]:
+    # "memory=2048,processes=100"
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, limit = item.split("=", 1)
+            limits[name.strip()] = int(limit.strip())
+    return limits
+
+
+def rlimit_args(limits: Dict[str, int], cgroup: Optional[Path] = None) -> List[str]:
+    """Return launcher arguments for limits not enforced by the cgroup."""
+    args = []
+    for name, limit in sorted(limits.items()):
+        if cgroup and name in CGROUP_LIMITS:
+            continue
+        if name not in RLIMITS:
+            if name in CGROUP_LIMITS:
+                logger.warning("Limit %s is not enforced without a cgroup", name)
+            continue
+        # Process exceeding its CPU time gets SIGXCPU before it is killed
+        hard = limit + CPU_KILL_GRACE if name == "cpu" else limit
+        args.extend(["--rlimit", f"{RLIMITS[name]}={limit}:{hard}"])
+    return args
+
+
+def create_cgroup(root: str, name: str, limits: Dict[str, int]) -> Path:
+    """Create cgroup v2 sub-group for limits of the whole robot.
+
+    The root must be a delegated cgroup with memory and pids controllers
+    enabled in its cgroup.subtree_control.
+    """
+    path = Path(root) / f"parrot-{name}"
+    # Controller files with whether the limit depends on them
+    files = []
+    if "memory" in limits:
+        files.append(("memory.max", f"{limits['memory'] * 1024 * 1024}", True))
+        # Swap is not limited, when swap accounting is not enabled
+        files.append(("memory.swap.max", "0", False))
+    if "processes" in limits:
+        files.append(("pids.max", f"{limits['processes']}", True))
+    try:
+        # Existing cgroup may still have processes of another run
+        path.mkdir()
+    except OSError as e:
+        raise LimitUnavailableError(f"Could not create cgroup {path}: {e}")
+    for filename, value, required in files:
+        try:
+            (path / filename).write_text(value)
+        except OSError as e:
+            if required:
+                path.rmdir()
+                raise LimitUnavailableError(
+                    f"Could not write {filename} of cgroup {path}: {e}"
+                )
+            logger.warning("Could not write %s of cgroup %s: %s", filename, path, e)
+    return path
+
+
+def read_events(path: Path) -> Dict[str, int]:
+    try:
+        return {
+            key: int(value)
+            for key, value in (
+                line.split() for line in path.read_text().splitlines() if line
+            )
+        }
+    except (OSError, ValueError):
+        return {}
+
+
+def cpu_usage(path: Path) -> float:
+    """Return CPU seconds used by the processes of the cgroup."""
+    return read_events(path / "cpu.stat").get("usage_usec", 0) / 1000000
+
+
+async def watch_cgroup(
+    path: Path, limits: Dict[str, int], stop: asyncio.Event, interval: float = 1
+):
+    """Set stop when the processes of the cgroup exceed their CPU time."""
+    while "cpu" in limits and not stop.is_set():
+        await asyncio.sleep(interval)
+        if cpu_usage(path) >= limits["cpu"]:
+            logger.warning(
+                "Cgroup %s exceeded CPU time of %s seconds", path, limits["cpu"]
+            )
+            stop.set()
+
+
+def violated_limit(
+    limits: Dict[str, int],
+    cgroup: Optional[Path],
+    output: bytes,
+) -> Optional[str]:
+    """Return the name of the limit the robot run most likely exceeded.
+
+    Limits enforced by a cgroup are detected from its events and CPU time.
+    Otherwise rlimit violations are detected from error messages.
+    """
+    if cgroup is not None:
+        if read_events(cgroup / "memory.events").get("oom_kill"):
+            return "memory"
+        if read_events(cgroup / "pids.events").get("max"):
+            return "processes"
+        if "cpu" in limits and cpu_usage(cgroup) >= limits["cpu"]:
+            return "cpu"
+    for name, messages in MESSAGES.items():
+        if cgroup is None and name not in RLIMITS:
+            continue
+        if name in limits and any(message in output for message in messages):
+            return name
+    return None
+
+
+async def remove_cgroup(path: Path, attempts: int = 10):
+    # Orphaned processes would keep the cgroup from being removed
+    kill = path / "cgroup.kill"
+    if kill.exists():
+        try:
+            kill.write_text("1")
+        except OSError:
+            pass
+    for attempt in range(attempts):
+        try:
+            path.rmdir()
+            return
+        except FileNotFoundError:
+            return
+        except OSError:
+            await asyncio.sleep(0.1 * (attempt + 1))
+    logger.warning("Could not remove cgroup %s", path)
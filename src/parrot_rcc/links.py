@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from parrot_rcc.s3 import s3_generate_presigned_url
+from parrot_rcc.types import Options
+from typing import Any
+from typing import Tuple
+from urllib.parse import quote
+import base64
+import hashlib
+import hmac
+import time
+
+
+# Seconds presigned URLs behind redirect links are valid for
+REDIRECT_EXPIRES_IN = 15 * 60
+
+
+def sign(secret: str, bucket: str, key: str) -> str:
+    digest = hmac.new(
+        secret.encode("utf-8"), f"{bucket}/{key}".encode("utf-8"), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode("ascii")
+
+
+def redirect_secret(config: Options) -> str:
+    # Links must be valid on every worker sharing the same buckets
+    return config.rcc_s3_redirect_secret or config.rcc_s3_secret_access_key
+
+
+async def s3_link(s3_client: Any, config: Options, bucket: str, key: str) -> str:
+    """Return a link to download the object without further authorization.
+
+    With a redirect URL, the link is a stable link to the redirect endpoint
+    of the healthz server. Otherwise it is a presigned S3 URL.
+    """
+    if config.rcc_s3_redirect_url:
+        token = sign(redirect_secret(config), bucket, key)
+        return "{}/s3/{}/{}?token={}".format(
+            config.rcc_s3_redirect_url.rstrip("/"), bucket, quote(key), token
+        )
+    return await s3_generate_presigned_url(
+        s3_client, bucket, key, config.rcc_s3_url_expires_in
+    )
+
+
+class PresignedURLs:
+    """Least recently used cache of short-lived presigned URLs."""
+
+    def __init__(self, size: int = 1024, expires_in: int = REDIRECT_EXPIRES_IN):
+        self.size = size
+        self.expires_in = expires_in
+        self._urls: OrderedDict[Tuple[str, str], Tuple[str, float]] = OrderedDict()
+
+    async def get(self, s3_client: Any, bucket: str, key: str) -> str:
+        now = time.monotonic()
+        if (bucket, key) in self._urls:
+            url, expires = self._urls[(bucket, key)]
+            # URLs are reused for at most half of their lifetime
+            if expires - now > self.expires_in / 2:
+                self._urls.move_to_end((bucket, key))
+                return url
+        url = await s3_generate_presigned_url(s3_client, bucket, key, self.expires_in)
+        self._urls[(bucket, key)] = url, now + self.expires_in
+        self._urls.move_to_end((bucket, key))
+        while len(self._urls) > self.size:
+            self._urls.popitem(last=False)
+        return url
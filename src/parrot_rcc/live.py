@@ -0,0 +1,136 @@
+from parrot_rcc.s3 import s3_put_object
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Optional
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_LISTENER = """\
+import json
+import os
+import time
+
+
+class ProgressListener:
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self):
+        self.path = os.environ.get("PARROT_RCC_PROGRESS_PATH")
+        self.progress = {
+            "suite": None,
+            "test": None,
+            "keyword": None,
+            "passed": 0,
+            "failed": 0,
+            "skipped": 0,
+            "tests": [],
+        }
+        self.written = 0
+
+    def write(self, force=True):
+        # Keywords are frequent, so their progress is written at most once a second
+        if not self.path or not force and time.time() - self.written < 1:
+            return
+        self.written = self.progress["updated"] = time.time()
+        with open(self.path + ".tmp", "w", encoding="utf-8") as fp:
+            json.dump(self.progress, fp, indent=4)
+        os.replace(self.path + ".tmp", self.path)
+
+    def start_suite(self, name, attrs):
+        self.progress["suite"] = attrs["longname"]
+        self.write()
+
+    def start_test(self, name, attrs):
+        self.progress["test"] = attrs["longname"]
+        self.write()
+
+    def start_keyword(self, name, attrs):
+        self.progress["keyword"] = name
+        self.write(force=False)
+
+    def end_test(self, name, attrs):
+        counter = {"PASS": "passed", "FAIL": "failed", "SKIP": "skipped"}
+        if attrs["status"] in counter:
+            self.progress[counter[attrs["status"]]] += 1
+        self.progress["tests"].append(
+            {
+                "name": attrs["longname"],
+                "status": attrs["status"],
+                "message": attrs["message"],
+                "elapsed": attrs["elapsedtime"],
+            }
+        )
+        self.progress["test"] = self.progress["keyword"] = None
+        self.write()
+
+    def close(self):
+        self.write()
+"""
+
+
+class LiveLogs:
+    """Upload output of a running robot to the logs bucket.
+
+    New stdout and stderr are uploaded as numbered chunks at most once per
+    interval, together with the latest progress written by the listener.
+    """
+
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket: str,
+        prefix: str,
+        interval: float,
+        progress_path: Optional[Path] = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.interval = interval
+        self.progress_path = progress_path
+        self.stdout = bytearray()
+        self.stderr = bytearray()
+        self._uploaded: Dict[str, int] = {"stdout": 0, "stderr": 0}
+        self._chunks: Dict[str, int] = {"stdout": 0, "stderr": 0}
+        self._progress_mtime = 0.0
+
+    async def upload(self):
+        for name, buffer in (("stdout", self.stdout), ("stderr", self.stderr)):
+            # Only complete lines are uploaded
+            end = buffer.rfind(b"\n") + 1
+            if end <= self._uploaded[name]:
+                continue
+            self._chunks[name] += 1
+            await s3_put_object(
+                self.s3_client,
+                self.bucket,
+                f"{self.prefix}/live/{name}.{self._chunks[name]:06}.txt",
+                bytes(buffer[self._uploaded[name] : end]),
+                "text/plain",
+            )
+            self._uploaded[name] = end
+        if self.progress_path is not None and self.progress_path.exists():
+            mtime = self.progress_path.stat().st_mtime
+            if mtime != self._progress_mtime:
+                self._progress_mtime = mtime
+                await s3_put_object(
+                    self.s3_client,
+                    self.bucket,
+                    f"{self.prefix}/live/progress.json",
+                    self.progress_path.read_bytes(),
+                    "application/json",
+                )
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.upload()
+            except Exception as e:
+                logger.warning(
+                    "Live logs of %s could not be uploaded: %s", self.prefix, e
+                )
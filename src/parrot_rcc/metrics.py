@@ -0,0 +1,52 @@
+from typing import Dict
+from typing import Tuple
+import threading
+
+
+class Metrics:
+    """Process metrics in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[Tuple, float]] = {}
+
+    def describe(self, name: str, kind: str, help: str):
+        with self._lock:
+            self._help[name] = kind, help
+            self._values.setdefault(name, {})
+
+    def set(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self._values.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, values in sorted(self._values.items()):
+                if name in self._help:
+                    kind, help = self._help[name]
+                    lines.append(f"# HELP {name} {help}")
+                    lines.append(f"# TYPE {name} {kind}")
+                for labels, value in values.items():
+                    if labels:
+                        label = ",".join(
+                            f'{key}="{escape(value)}"' for key, value in labels
+                        )
+                        lines.append(f"{name}{{{label}}} {value}")
+                    else:
+                        lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
@@ -0,0 +1,91 @@
+from parrot_rcc.metrics import metrics
+from pyzeebe import Job
+from types import FrameType
+from typing import Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "parrot_rcc_event_loop_lag_seconds",
+    "gauge",
+    "Delay in scheduling callbacks on the event loop.",
+)
+metrics.describe(
+    "parrot_rcc_event_loop_blocked_total",
+    "counter",
+    "Times the event loop was blocked longer than the threshold.",
+)
+
+
+class LoopMonitor:
+    """Measure event loop lag and log the stack of code blocking the loop.
+
+    Lag is measured by a coroutine sleeping on the loop. A watchdog thread
+    logs the stack of the loop thread when the coroutine has not been
+    resumed within the threshold.
+    """
+
+    def __init__(self, interval: float = 0.25, threshold: float = 1.0):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._thread_id = None
+        self._stopped = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._thread_id = threading.get_ident()
+        loop.create_task(self.run())
+        if self.threshold > 0:
+            threading.Thread(target=self.watch, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while not self._stopped.is_set():
+            started = loop.time()
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - started - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            metrics.set("parrot_rcc_event_loop_lag_seconds", self.lag)
+
+    def watch(self):
+        reported = None
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            reported = beat
+            metrics.inc("parrot_rcc_event_loop_blocked_total")
+            job_key = frame_job_key(frame)
+            logger.warning(
+                "Event loop blocked for %.2fs%s:\n%s",
+                blocked,
+                f" by job {job_key}" if job_key else "",
+                "".join(traceback.format_stack(frame)),
+            )
+
+
+def frame_job_key(frame: Optional[FrameType]) -> Optional[int]:
+    # Tasks receive their job as the "__job" argument
+    while frame is not None:
+        job = frame.f_locals.get("__job")
+        if isinstance(job, Job):
+            return job.key
+        frame = frame.f_back
+    return None
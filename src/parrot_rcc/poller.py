@@ -0,0 +1,45 @@
+from pyzeebe.worker.job_poller import JobPoller
+from typing import Callable
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class Poller(JobPoller):
+    """JobPoller, which does not activate jobs for the task while paused.
+
+    With a delay for the task, jobs are polled only after the delay and
+    without long polling, which lets other workers activate them first.
+    """
+
+    def __init__(
+        self,
+        *args,
+        paused: Callable[[str], bool] = lambda task_type: False,
+        delay: Callable[[str], float] = lambda task_type: 0,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.paused = paused
+        self.delay = delay
+        self.long_polling_timeout = self.request_timeout
+
+    async def activate_max_jobs(self):
+        if self.paused(self.task.type):
+            logger.debug(
+                "Polling jobs for task %s is paused. Polling again in %s seconds...",
+                self.task.type,
+                self.poll_retry_delay,
+            )
+            await asyncio.sleep(self.poll_retry_delay)
+            return
+        delay = self.delay(self.task.type)
+        if delay > 0:
+            await asyncio.sleep(delay)
+            # Negative request timeout disables long polling
+            self.request_timeout = -1
+        else:
+            self.request_timeout = self.long_polling_timeout
+        await super().activate_max_jobs()
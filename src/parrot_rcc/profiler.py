@@ -0,0 +1,88 @@
+from collections import Counter
+from types import FrameType
+from typing import Callable
+from typing import Optional
+from typing import Tuple
+import asyncio
+import cProfile
+import marshal
+import sys
+import threading
+
+
+class Sampler:
+    """Sample stacks of running threads into collapsed stack format.
+
+    Collapsed stacks ("frame;frame;frame count" per line) are the input
+    format of flamegraph.pl, speedscope and similar flame graph tools.
+    """
+
+    def __init__(
+        self,
+        thread_id: Optional[int] = None,
+        include: Optional[Callable[[FrameType], bool]] = None,
+        interval: float = 0.01,
+    ):
+        self.thread_id = thread_id
+        self.include = include
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_id is not None and thread_id != self.thread_id:
+                    continue
+                if self.include is not None and not self.include(frame):
+                    continue
+                name = names.get(thread_id, str(thread_id))
+                self.samples[f"{name};{collapse(frame)}"] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+
+
+def collapse(frame: Optional[FrameType]) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+async def profile(seconds: float, mode: str = "sample") -> Tuple[bytes, str]:
+    """Profile the process and return the result with its file extension.
+
+    Sampling covers all threads and returns collapsed stacks. cProfile
+    covers the event loop thread and returns marshalled pstats.
+    """
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        profiler.create_stats()
+        return marshal.dumps(profiler.stats), "pstats"
+    sampler = Sampler()
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await asyncio.get_event_loop().run_in_executor(None, sampler.stop)
+    return sampler.collapsed().encode("utf-8"), "collapsed"
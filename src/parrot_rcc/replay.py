@@ -0,0 +1,150 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pyzeebe import Job
+from pyzeebe.task.task import Task
+from typing import Dict
+from typing import List
+import asyncio
+import functools
+import json
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "***"
+
+
+class Recorder:
+    """Append activated jobs with their arrival time into a JSON lines file.
+
+    Values of variables matching any of the redaction patterns are replaced.
+    """
+
+    def __init__(self, path: str, redact: List[str]):
+        self.path = path
+        self.redact = [pattern.lower() for pattern in redact]
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def redacted(self, variables: Dict) -> Dict:
+        return {
+            name: REDACTED
+            if any(fnmatch(name.lower(), pattern) for pattern in self.redact)
+            else value
+            for name, value in variables.items()
+            # Internal variables are set by the worker itself
+            if not name.startswith("__") and "." not in name
+        }
+
+    def write(self, data: Dict):
+        line = json.dumps(
+            data
+            | {"variables": self.redacted(data["variables"]), "timestamp": time.time()},
+            default=str,
+        )
+        asyncio.get_event_loop().run_in_executor(self._executor, self.append, line)
+
+    def append(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as fp:
+            fp.write(f"{line}\n")
+
+
+@functools.lru_cache()
+def get_recorder(path: str, redact: str) -> Recorder:
+    return Recorder(path, [pattern.strip() for pattern in redact.split(",") if pattern])
+
+
+class ReplayAdapter:
+    """Zeebe adapter, which only keeps the outcomes of replayed jobs."""
+
+    def __init__(self):
+        self.outcomes: Dict[int, str] = {}
+
+    async def complete_job(self, job_key: int, variables: Dict):
+        self.outcomes[job_key] = "completed"
+
+    async def fail_job(self, job_key: int, retries: int, message: str, **kwargs):
+        self.outcomes[job_key] = "failed"
+
+    async def throw_error(self, job_key: int, message: str, error_code: str = ""):
+        self.outcomes[job_key] = "error"
+
+    async def set_variables(
+        self, element_instance_key: int, variables: Dict, local: bool
+    ):
+        pass
+
+
+def job_from_dict(data: Dict, adapter: ReplayAdapter) -> Job:
+    # Deadline is kept relative to the original arrival time
+    deadline = (
+        int(time.time() * 1000) + data["deadline"] - int(data["timestamp"] * 1000)
+    )
+    return Job(
+        key=data["jobKey"],
+        _type=data["taskType"],
+        process_instance_key=data["processInstanceKey"],
+        bpmn_process_id=data["bpmnProcessId"],
+        process_definition_version=data["processDefinitionVersion"],
+        process_definition_key=data["processDefinitionKey"],
+        element_id=data["elementId"],
+        element_instance_key=data["elementInstanceKey"],
+        custom_headers=data["customHeaders"],
+        worker=data["worker"],
+        retries=data["retries"],
+        deadline=deadline,
+        variables=data["variables"],
+        zeebe_adapter=adapter,
+    )
+
+
+async def replay(path: str, tasks: Dict[str, Task], rate: float = 1):
+    """Execute recorded jobs at their recorded arrival rate multiplied by rate.
+
+    Jobs are executed as fast as possible when rate is 0.
+    """
+    with open(path, "r", encoding="utf-8") as fp:
+        records = [json.loads(line) for line in fp if line.strip()]
+    adapter = ReplayAdapter()
+    durations: List[float] = []
+
+    async def execute(task: Task, job: Job):
+        started = time.monotonic()
+        await task.job_handler(job)
+        durations.append(time.monotonic() - started)
+        logger.info(
+            "Replayed job %s %s in %.1fs",
+            job.key,
+            adapter.outcomes.get(job.key, "unfinished"),
+            durations[-1],
+        )
+
+    started = time.monotonic()
+    first = records[0]["timestamp"] if records else 0
+    futures = []
+    for record in records:
+        if rate > 0:
+            delay = (record["timestamp"] - first) / rate - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if record["taskType"] not in tasks:
+            logger.warning(
+                "Skipping job %s of unknown task %s",
+                record["jobKey"],
+                record["taskType"],
+            )
+            continue
+        job = job_from_dict(record, adapter)
+        futures.append(asyncio.ensure_future(execute(tasks[job.type], job)))
+    await asyncio.gather(*futures)
+
+    logger.info(
+        "Replayed %s jobs in %.1fs (mean %.1fs, max %.1fs): %s",
+        len(durations),
+        time.monotonic() - started,
+        sum(durations) / len(durations) if durations else 0,
+        max(durations, default=0),
+        dict(Counter(adapter.outcomes.values())),
+    )
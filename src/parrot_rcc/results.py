@@ -0,0 +1,61 @@
+from parrot_rcc.s3 import s3_get_object
+from parrot_rcc.s3 import s3_put_object
+from parrot_rcc.types import ItemRelease
+from parrot_rcc.types import ItemReleaseException
+from parrot_rcc.types import ItemReleaseExceptionType
+from parrot_rcc.types import ItemReleaseState
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+import dataclasses
+import json
+
+
+def release_from_json(release_json: Dict) -> ItemRelease:
+    return ItemRelease(
+        state=ItemReleaseState.FAILED
+        if release_json.get("state") == "FAILED"
+        else ItemReleaseState.DONE,
+        exception=None
+        if not release_json.get("exception")
+        else ItemReleaseException(
+            type=ItemReleaseExceptionType.BUSINESS
+            if (release_json.get("exception") or {}).get("type") == "BUSINESS"
+            else ItemReleaseExceptionType.APPLICATION,
+            code=(release_json.get("exception") or {}).get("code") or "",
+            message=(release_json.get("exception") or {}).get("message") or "",
+        ),
+    )
+
+
+async def save_result(
+    s3_client: Any,
+    s3_bucket_name: str,
+    s3_key: str,
+    payload: Dict,
+    release: ItemRelease,
+):
+    await s3_put_object(
+        s3_client,
+        s3_bucket_name,
+        s3_key,
+        json.dumps({"payload": payload, "release": dataclasses.asdict(release)}).encode(
+            "utf-8"
+        ),
+        "application/json",
+    )
+
+
+async def load_result(
+    s3_client: Any, s3_bucket_name: str, s3_key: str
+) -> Optional[Tuple[Dict, ItemRelease]]:
+    from botocore.exceptions import ClientError
+
+    try:
+        result = json.loads(await s3_get_object(s3_client, s3_bucket_name, s3_key))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ["404", "NoSuchKey"]:
+            return None
+        raise
+    return result["payload"], release_from_json(result["release"])
@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Dict
+from typing import List
+import random
+
+
+# Local job variable counting the failed attempts of a job retried by a policy
+ATTEMPT_VARIABLE = "parrotRetryAttempt"
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with jitter for retryable failures.
+
+    Retries are counted down by the retries of the Zeebe job, which are
+    capped to the policy retries. Backoff grows with the failed attempts of
+    the job. Failures with codes other than the listed ones are not retried.
+    """
+
+    backoff_ms: int = 10 * 1000
+    max_backoff_ms: int = 10 * 60 * 1000
+    multiplier: float = 2
+    jitter: float = 0.2
+    retries: int = 3
+    codes: List[str] = field(default_factory=list)
+
+    def is_retryable(self, code: str) -> bool:
+        return not self.codes or code in self.codes
+
+    def remaining(self, job_retries: int) -> int:
+        return max(0, min(job_retries, self.retries) - 1)
+
+    def backoff(self, attempt: int) -> int:
+        """Return milliseconds to wait before retrying after failed attempts."""
+        delay = min(self.max_backoff_ms, self.backoff_ms * self.multiplier**attempt)
+        return int(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+def parse_retry(value: Any) -> RetryPolicy:
+    # "backoff=10000,max_backoff=600000,multiplier=2,jitter=0.2,retries=5,codes=A|B"
+    # or the same as a mapping in robot.yaml with codes as a list
+    if isinstance(value, str):
+        value = dict(
+            item.split("=", 1) for item in value.split(",") if "=" in item.strip()
+        )
+    options: Dict[str, Any] = {
+        name.strip(): option.strip() if isinstance(option, str) else option
+        for name, option in value.items()
+    }
+    codes = options.get("codes") or []
+    return RetryPolicy(
+        backoff_ms=int(options.get("backoff", 10 * 1000)),
+        max_backoff_ms=int(options.get("max_backoff", 10 * 60 * 1000)),
+        multiplier=float(options.get("multiplier", 2)),
+        jitter=float(options.get("jitter", 0.2)),
+        retries=int(options.get("retries", 3)),
+        codes=codes.split("|") if isinstance(codes, str) else list(codes),
+    )
@@ -0,0 +1,275 @@
+from parrot_rcc.batch import parse_batch
+from parrot_rcc.limits import parse_limits
+from parrot_rcc.retry import parse_retry
+from parrot_rcc.s3 import create_s3_client
+from parrot_rcc.s3 import create_s3_resource
+from parrot_rcc.s3 import s3_download_file
+from parrot_rcc.s3 import s3_list_objects
+from parrot_rcc.types import Options
+from parrot_rcc.types import RobotTask
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from zipfile import ZipFile
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import yaml
+
+
+logger = logging.getLogger(__name__)
+
+
+def read_robot_yaml(robot: Path) -> Dict:
+    with ZipFile(robot, "r") as fp:
+        return yaml.safe_load(fp.read("robot.yaml"))
+
+
+def parse_task_mapping(value: str) -> Dict[str, str]:
+    # "Task A=value;Task B=value"
+    mapping = {}
+    for item in value.split(";"):
+        if "=" in item:
+            task, task_value = item.split("=", 1)
+            mapping[task.strip()] = task_value.strip()
+    return mapping
+
+
+def robot_tasks(robot: Path, robot_yaml: Dict, config: Options) -> Dict[str, RobotTask]:
+    variables = (robot_yaml.get("variables") or {}) | {
+        task: [name.strip() for name in names.split(",") if name.strip()]
+        for task, names in parse_task_mapping(config.task_variables).items()
+    }
+    idempotent = set(robot_yaml.get("idempotent") or []) | {
+        task.strip() for task in config.task_idempotent.split(";") if task.strip()
+    }
+    limits = {
+        task: {name: int(limit) for name, limit in task_limits.items()}
+        for task, task_limits in (robot_yaml.get("limits") or {}).items()
+    } | {
+        task: parse_limits(task_limits)
+        for task, task_limits in parse_task_mapping(config.task_limits).items()
+    }
+    batch = {
+        task: parse_batch(task_batch)
+        for task, task_batch in (
+            (robot_yaml.get("batch") or {}) | parse_task_mapping(config.task_batch)
+        ).items()
+    }
+    retry = {
+        task: parse_retry(task_retry)
+        for task, task_retry in (
+            (robot_yaml.get("retry") or {}) | parse_task_mapping(config.task_retry)
+        ).items()
+    }
+    return {
+        task: RobotTask(
+            task=task,
+            robot=str(robot.resolve()),
+            vault=robot_yaml.get("vault") or {},
+            variables=variables.get(task),
+            idempotent=task in idempotent,
+            limits=limits.get(task) or {},
+            batch_size=batch[task][0] if task in batch else 1,
+            batch_window_ms=batch[task][1] if task in batch else 0,
+            retry=retry.get(task),
+        )
+        for task in robot_yaml.get("tasks") or {}
+    }
+
+
+def load_index(path: Path) -> Dict[str, Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            return json.loads(fp.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_index(path: Path, index: Dict[str, Dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = path.with_suffix(".part")
+    with open(partial_path, "w", encoding="utf-8") as fp:
+        fp.write(json.dumps(index))
+    partial_path.rename(path)
+
+
+def index_key(robot: Path) -> str:
+    stat = robot.stat()
+    return f"{robot.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def scan_local(source: str) -> Dict[str, Tuple]:
+    path = Path(source)
+    if path.is_dir():
+        paths = sorted(path.glob("*.zip"))
+    elif path.exists():
+        paths = [path]
+    else:
+        paths = []
+    found = {}
+    for path in paths:
+        stat = path.stat()
+        found[str(path.resolve())] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+class Robots:
+    """Tasks of robot packages found from the configured sources.
+
+    Sources are robot packages, directories of robot packages, or S3 prefixes
+    (s3://bucket/prefix/) of robot packages, which are cached locally.
+    """
+
+    def __init__(self, sources: List[str], config: Options, snapshot: bool = False):
+        self.sources = sources
+        self.config = config
+        self.cache_dir = Path(
+            config.robots_cache_dir
+            or os.path.join(tempfile.gettempdir(), "parrot-rcc", "robots")
+        )
+        # Snapshots allow robot packages to be replaced in place
+        # without affecting jobs already started with the previous version.
+        self.snapshot = snapshot
+        self.tasks: Dict[str, RobotTask] = {}
+        self._packages: Dict[str, Tuple[Tuple, str, Dict[str, RobotTask]]] = {}
+        self._seen: Dict[str, Tuple] = {}
+        self._refreshed = False
+        self._removed: Dict[str, RobotTask] = {}
+        # Parsed robot.yaml files by package path, size and mtime
+        self.index_path = self.cache_dir / "index.json"
+        self._index: Optional[Dict[str, Dict]] = None
+        self._unreferenced: Dict[Path, float] = {}
+
+    def __getitem__(self, task: str) -> RobotTask:
+        # Jobs activated before their task was removed may still be executed
+        return self.tasks[task] if task in self.tasks else self._removed[task]
+
+    async def refresh(self) -> Tuple[List[str], List[str], List[str]]:
+        """Rescan sources and return added, changed and removed tasks."""
+        loop = asyncio.get_event_loop()
+        if self._index is None:
+            self._index = await loop.run_in_executor(None, load_index, self.index_path)
+        indexed = False
+        seen = {}
+        for source in self.sources:
+            if source.startswith("s3://"):
+                seen.update(await self._scan_s3(source))
+            else:
+                seen.update(await loop.run_in_executor(None, scan_local, source))
+
+        packages = {}
+        for package, stamp in seen.items():
+            if package in self._packages and self._packages[package][0] == stamp:
+                packages[package] = self._packages[package]
+                continue
+            if (
+                self.snapshot
+                and self._refreshed
+                and not package.startswith("s3://")
+                and self._seen.get(package) != stamp
+            ):
+                # Package is still being written or was just replaced
+                if package in self._packages:
+                    packages[package] = self._packages[package]
+                continue
+            try:
+                local_path = await self._fetch(package, stamp)
+                key = index_key(local_path)
+                if key not in self._index:
+                    self._index[key] = await loop.run_in_executor(
+                        None, read_robot_yaml, local_path
+                    )
+                    indexed = True
+                tasks = robot_tasks(local_path, self._index[key], self.config)
+            except Exception as e:
+                logger.warning("Robot package %s could not be loaded: %s", package, e)
+                if package in self._packages:
+                    packages[package] = self._packages[package]
+                continue
+            packages[package] = stamp, key, tasks
+        index = {
+            key: self._index[key]
+            for stamp, key, tasks in packages.values()
+            if key in self._index
+        }
+        if indexed or len(index) != len(self._index):
+            await loop.run_in_executor(None, save_index, self.index_path, index)
+        self._index = index
+        self._seen = seen
+        self._packages = packages
+        self._refreshed = True
+
+        tasks = {}
+        for stamp, key, package_tasks in packages.values():
+            tasks.update(package_tasks)
+        added = [task for task in tasks if task not in self.tasks]
+        changed = [
+            task
+            for task in tasks
+            if task in self.tasks and tasks[task] != self.tasks[task]
+        ]
+        removed = [task for task in self.tasks if task not in tasks]
+        self._removed = {
+            task: robot_task
+            for task, robot_task in (self._removed | self.tasks).items()
+            if task not in tasks
+        }
+        self.tasks = tasks
+
+        await loop.run_in_executor(None, self._prune)
+        return added, changed, removed
+
+    async def _scan_s3(self, source: str) -> Dict[str, Tuple]:
+        bucket, prefix = (source[len("s3://") :].split("/", 1) + [""])[:2]
+        return {
+            f"s3://{bucket}/{key}": (etag,)
+            for key, etag in await s3_list_objects(
+                create_s3_resource(self.config), bucket, prefix
+            )
+            if key.endswith(".zip")
+        }
+
+    async def _fetch(self, package: str, stamp: Tuple) -> Path:
+        if not (self.snapshot or package.startswith("s3://")):
+            return Path(package)
+        digest = hashlib.sha1(f"{package}{stamp}".encode("utf-8")).hexdigest()
+        local_path = self.cache_dir / f"{digest}.zip"
+        if local_path.exists():
+            return local_path
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        partial_path = local_path.with_suffix(".part")
+        if package.startswith("s3://"):
+            bucket, key = package[len("s3://") :].split("/", 1)
+            await s3_download_file(
+                create_s3_client(self.config), bucket, key, str(partial_path)
+            )
+        else:
+            await asyncio.get_event_loop().run_in_executor(
+                None, shutil.copyfile, package, partial_path
+            )
+        partial_path.rename(local_path)
+        return local_path
+
+    def _prune(self):
+        # Cached packages are kept until no job could still be using them
+        if not self.cache_dir.exists():
+            return
+        referenced = {Path(task.robot).resolve() for task in self.tasks.values()}
+        now = time.time()
+        for path in self.cache_dir.glob("*.zip"):
+            if path.resolve() in referenced:
+                self._unreferenced.pop(path, None)
+            elif now - self._unreferenced.setdefault(path, now) > (
+                self.config.task_timeout_ms / 1000
+            ):
+                logger.info("Removing unused robot package %s", path)
+                path.unlink(missing_ok=True)
+                self._unreferenced.pop(path)
@@ -1,23 +1,79 @@
 from concurrent.futures import ThreadPoolExecutor
+from parrot_rcc.breaker import CircuitBreaker
+from parrot_rcc.types import Options
 from typing import Any
 from typing import List
+from typing import Tuple
 import asyncio
+import mimetypes
 
-try:
-    import magic
 
-    HAS_MAGIC = True
-except (ImportError, TypeError):
-    import mimetypes
+def has_magic() -> bool:
+    # file-magic is imported only once the first file is uploaded
+    global HAS_MAGIC
+    if HAS_MAGIC is None:
+        try:
+            import magic  # noqa: F401
 
-    HAS_MAGIC = False
+            HAS_MAGIC = True
+        except (ImportError, TypeError):
+            HAS_MAGIC = False
+    return HAS_MAGIC
+
+
+HAS_MAGIC = None
 
 
 default_executor = ThreadPoolExecutor()
 
 
+def s3_failure(error: BaseException) -> bool:
+    # Only connection errors and server errors indicate that S3 is unavailable
+    if not type(error).__module__.startswith(("botocore", "boto3", "urllib3")):
+        return False
+    response = getattr(error, "response", None) or {}
+    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return status is None or status >= 500
+
+
+s3_breaker = CircuitBreaker("S3", s3_failure)
+
+
+def create_s3_client(config: Options) -> Any:
+    import boto3
+
+    # https://gist.github.com/heitorlessa/5b709df96ea6ac5ddc600545c0683d3b
+    return boto3.client(
+        "s3",
+        endpoint_url=config.rcc_s3_url,
+        aws_access_key_id=config.rcc_s3_access_key_id,
+        aws_secret_access_key=config.rcc_s3_secret_access_key,
+        aws_session_token=None,
+        config=boto3.session.Config(signature_version="s3v4"),
+        region_name=config.rcc_s3_region,
+        verify=False,
+    )
+
+
+def create_s3_resource(config: Options) -> Any:
+    import boto3
+
+    return boto3.resource(
+        "s3",
+        endpoint_url=config.rcc_s3_url,
+        aws_access_key_id=config.rcc_s3_access_key_id,
+        aws_secret_access_key=config.rcc_s3_secret_access_key,
+        aws_session_token=None,
+        config=boto3.session.Config(signature_version="s3v4"),
+        region_name=config.rcc_s3_region,
+        verify=False,
+    )
+
+
 def mimetype_from_filename(local_path: str) -> str:
-    if HAS_MAGIC:
+    if has_magic():
+        import magic
+
         return magic.detect_from_filename(local_path).mime_type
     else:
         mime_type, _ = mimetypes.guess_type(local_path)
@@ -34,6 +90,7 @@ def s3_download_file_sync(
     )
 
 
+@s3_breaker
 async def s3_download_file(
     s3_client: Any,
     s3_bucket_name: str,
@@ -101,6 +158,7 @@ def s3_upload_file_sync(
     )
 
 
+@s3_breaker
 async def s3_upload_file(
     s3_client: Any,
     local_path: str,
@@ -131,6 +189,7 @@ def s3_put_object_sync(
     )
 
 
+@s3_breaker
 async def s3_put_object(
     s3_client: Any,
     s3_bucket_name: str,
@@ -151,6 +210,29 @@ async def s3_put_object(
     )
 
 
+def s3_get_object_sync(s3_client: Any, s3_bucket_name: str, s3_key: str) -> bytes:
+    return s3_client.get_object(Bucket=s3_bucket_name, Key=s3_key)["Body"].read()
+
+
+@s3_breaker
+async def s3_get_object(
+    s3_client: Any,
+    s3_bucket_name: str,
+    s3_key: str,
+    loop=None,
+    executor=None,
+) -> bytes:
+    return await (
+        loop if loop is not None else asyncio.get_event_loop()
+    ).run_in_executor(
+        executor if executor is not None else default_executor,
+        s3_get_object_sync,
+        s3_client,
+        s3_bucket_name,
+        s3_key,
+    )
+
+
 def s3_list_files_sync(
     s3_resource: Any, s3_bucket_name: str, prefix: str = ""
 ) -> List[str]:
@@ -159,6 +241,7 @@ def s3_list_files_sync(
     ]
 
 
+@s3_breaker
 async def s3_list_files(
     s3_resource: Any, s3_bucket_name: str, prefix: str, loop=None, executor=None
 ) -> List[str]:
@@ -171,3 +254,35 @@ async def s3_list_files(
         s3_bucket_name,
         prefix,
     )
+
+
+def s3_list_objects_sync(
+    s3_resource: Any, s3_bucket_name: str, prefix: str = ""
+) -> List[Tuple[str, str]]:
+    return [
+        (o.key, o.e_tag.strip('"'))
+        for o in s3_resource.Bucket(s3_bucket_name).objects.filter(Prefix=prefix)
+    ]
+
+
+@s3_breaker
+async def s3_list_objects(
+    s3_resource: Any, s3_bucket_name: str, prefix: str, loop=None, executor=None
+) -> List[Tuple[str, str]]:
+    return await (
+        loop if loop is not None else asyncio.get_event_loop()
+    ).run_in_executor(
+        executor if executor is not None else default_executor,
+        s3_list_objects_sync,
+        s3_resource,
+        s3_bucket_name,
+        prefix,
+    )
+
+
+async def s3_probe(config: Options):
+    s3_client = create_s3_client(config)
+    await asyncio.get_event_loop().run_in_executor(
+        default_executor,
+        lambda: s3_client.head_bucket(Bucket=config.rcc_s3_bucket_logs),
+    )
@@ -0,0 +1,205 @@
+from parrot_rcc.admission import Slots
+from parrot_rcc.poller import Poller
+from pyzeebe.errors import ActivateJobsRequestInvalidError
+from pyzeebe.errors import ZeebeBackPressureError
+from pyzeebe.errors import ZeebeGatewayUnavailableError
+from pyzeebe.errors import ZeebeInternalError
+from typing import Dict
+from typing import List
+from typing import Optional
+from zeebe_grpc.gateway_pb2 import ActivatedJob
+import asyncio
+import grpc
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+STREAM_ACTIVATED_JOBS = "/gateway_protocol.Gateway/StreamActivatedJobs"
+
+# Seconds between polls for jobs activatable before the stream was opened
+BACKLOG_POLL_INTERVAL = 30
+
+
+def varint(value: int) -> bytes:
+    value &= (1 << 64) - 1
+    data = bytearray()
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def read_varint(data: bytes, pos: int):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def encode_stream_request(
+    task_type: str, worker: str, timeout: int, fetch_variable: List[str]
+) -> bytes:
+    """Encode StreamActivatedJobsRequest, which zeebe-grpc does not include.
+
+    message StreamActivatedJobsRequest {
+      string type = 1;
+      string worker = 2;
+      int64 timeout = 3;
+      repeated string fetchVariable = 5;
+    }
+    """
+
+    def string(number: int, value: str) -> bytes:
+        encoded = value.encode("utf-8")
+        return varint(number << 3 | 2) + varint(len(encoded)) + encoded
+
+    return b"".join(
+        [string(1, task_type), string(2, worker), varint(3 << 3) + varint(timeout)]
+        + [string(5, name) for name in fetch_variable]
+    )
+
+
+def decode_stream_request(data: bytes) -> Dict:
+    request: Dict = {"type": "", "worker": "", "timeout": 0, "fetchVariable": []}
+    names = {1: "type", 2: "worker", 5: "fetchVariable"}
+    pos = 0
+    while pos < len(data):
+        tag, pos = read_varint(data, pos)
+        number, wire_type = tag >> 3, tag & 7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+            if number == 3:
+                request["timeout"] = value
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            value = data[pos : pos + length].decode("utf-8")
+            pos += length
+            if names.get(number) == "fetchVariable":
+                request["fetchVariable"].append(value)
+            elif number in names:
+                request[names[number]] = value
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+    return request
+
+
+class JobStreamer(Poller):
+    """Receive jobs pushed by the gateway instead of polling for them.
+
+    The stream is not read while the slots have no capacity for new jobs,
+    which lets the gateway's flow control push jobs to other workers. Jobs
+    activatable before the stream was opened are polled periodically. Falls
+    back to polling when the gateway does not support job streaming, and
+    jobs are polled instead of streamed while they are delayed.
+    """
+
+    def __init__(self, *args, slots: Optional[Slots] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slots = slots
+
+    def has_capacity(self) -> bool:
+        if self.paused(self.task.type):
+            return False
+        if self.calculate_max_jobs_to_activate() <= 0:
+            return False
+        return (
+            self.slots is None
+            or self.slots.free - self.slots.waiting - self.queue.qsize() > 0
+        )
+
+    async def wait_capacity(self):
+        while not self.has_capacity() and not self.stop_event.is_set():
+            await asyncio.sleep(0.1)
+
+    async def poll(self):
+        backlog = asyncio.ensure_future(self.poll_backlog())
+        try:
+            while self.should_poll():
+                if self.delay(self.task.type) > 0:
+                    # Jobs are streamed only to workers without delay for them
+                    await self.activate_max_jobs()
+                    continue
+                await self.wait_capacity()
+                try:
+                    await self.stream_once()
+                except grpc.aio.AioRpcError as e:
+                    if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                        logger.warning(
+                            "Job streaming is not supported by the gateway. "
+                            "Polling jobs for task %s instead.",
+                            self.task.type,
+                        )
+                        break
+                    logger.warning(
+                        "Job stream for task %s failed: %s. Retrying in %s seconds...",
+                        self.task.type,
+                        e.code(),
+                        self.poll_retry_delay,
+                    )
+                    await asyncio.sleep(self.poll_retry_delay)
+        finally:
+            backlog.cancel()
+        await super().poll()
+
+    async def stream_once(self):
+        call = self.zeebe_adapter._channel.unary_stream(
+            STREAM_ACTIVATED_JOBS,
+            request_serializer=lambda request: request,
+            response_deserializer=ActivatedJob.FromString,
+        )(
+            encode_stream_request(
+                self.task.type,
+                self.worker_name,
+                self.task.config.timeout_ms,
+                self.task.config.variables_to_fetch,
+            )
+        )
+        stopped = asyncio.ensure_future(self.stop_event.wait())
+        stopped.add_done_callback(lambda future: call.cancel())
+        try:
+            async for raw_job in call:
+                job = self.zeebe_adapter._create_job_from_raw_job(raw_job)
+                logger.debug("Got job: %s from zeebe stream", job)
+                self.task_state.add(job)
+                await self.queue.put(job)
+                await self.wait_capacity()
+        except asyncio.CancelledError:
+            # Reading a call cancelled on stop raises CancelledError
+            if not self.stop_event.is_set():
+                raise
+        finally:
+            stopped.cancel()
+            call.cancel()
+
+    async def poll_backlog(self):
+        while self.should_poll():
+            if self.has_capacity() and not self.delay(self.task.type):
+                try:
+                    # Negative request timeout disables long polling
+                    async for job in self.zeebe_adapter.activate_jobs(
+                        task_type=self.task.type,
+                        worker=self.worker_name,
+                        timeout=self.task.config.timeout_ms,
+                        max_jobs_to_activate=self.calculate_max_jobs_to_activate(),
+                        variables_to_fetch=self.task.config.variables_to_fetch,
+                        request_timeout=-1,
+                    ):
+                        self.task_state.add(job)
+                        await self.queue.put(job)
+                except ActivateJobsRequestInvalidError:
+                    logger.warning(
+                        "Activate job requests was invalid for task %s", self.task.type
+                    )
+                except (
+                    ZeebeBackPressureError,
+                    ZeebeGatewayUnavailableError,
+                    ZeebeInternalError,
+                ) as e:
+                    logger.warning("Failed to activate jobs from the gateway: %r", e)
+            await asyncio.sleep(BACKLOG_POLL_INTERVAL)
@@ -1,5 +1,9 @@
 from dataclasses import dataclass
+from dataclasses import field
 from enum import Enum
+from parrot_rcc.retry import RetryPolicy
+from typing import Dict
+from typing import List
 from typing import Optional
 import multiprocessing
 
@@ -57,6 +61,19 @@ class ItemRelease:
     exception: Optional[ItemReleaseException]
 
 
+@dataclass
+class RobotTask:
+    task: str
+    robot: str
+    vault: Dict[str, str]
+    variables: Optional[List[str]] = None
+    idempotent: bool = False
+    limits: Dict[str, int] = field(default_factory=dict)
+    batch_size: int = 1
+    batch_window_ms: int = 0
+    retry: Optional[RetryPolicy] = None
+
+
 @dataclass
 class Options:
     business_key: str = "businessKey"
@@ -72,9 +89,33 @@ class Options:
     rcc_s3_bucket_logs: str = "rcc"
     rcc_s3_bucket_data: str = "zeebe"
     rcc_s3_url_expires_in: int = 3600 * 24 * 7  # one week
+    rcc_s3_redirect_url: str = ""
+    rcc_s3_redirect_secret: str = ""
+    rcc_s3_offload_threshold: int = 0
+    rcc_s3_live_interval: int = 0
+
+    robots_watch_interval: int = 0
+    robots_cache_dir: str = ""
+
+    work_root: str = ""
+    work_quota_mb: int = 0
 
     task_timeout_ms: int = 60 * 60 * 1000  # one hour
+    task_deadline_margin_ms: int = 30 * 1000
+    task_kill_grace_ms: int = 10 * 1000
+    task_prepare_early: bool = False
     task_max_jobs: int = (multiprocessing.cpu_count(),)
+    admission_min_memory_mb: int = 0
+    admission_max_load: float = 0
+    admission_min_disk_mb: int = 0
+    admission_history: bool = False
+    task_variables: str = ""
+    task_idempotent: str = ""
+    task_usage_variable: str = ""
+    task_limits: str = ""
+    task_batch: str = ""
+    task_retry: str = ""
+    task_cgroup_root: str = ""
 
     zeebe_hostname: str = "localhost"
     zeebe_port: int = 26500
@@ -87,6 +128,21 @@ class Options:
 
     log_level: LogLevel = "info"
     debug: bool = False
+    log_format: str = "text"
+    loop_lag_threshold_ms: int = 1000
+    debug_token: str = ""
+    zeebe_streaming: bool = False
+    affinity_nodes: str = ""
+    affinity_node_id: str = ""
+    affinity_delay_ms: int = 5000
+    holotree_s3_prefix: str = ""
+    record: str = ""
+    record_redact: str = "*password*,*secret*,*token*"
+    replay: str = ""
+    replay_rate: float = 1
+    replay_s3_prefix: str = "replay"
+    breaker_threshold: int = 3
+    breaker_interval: int = 10
 
     camunda_client_id: str = ""
     camunda_client_secret: str = ""
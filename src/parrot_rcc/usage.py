@@ -0,0 +1,86 @@
+from parrot_rcc.metrics import metrics
+from typing import Dict
+import json
+
+
+FIELDS = ["wall", "user", "system", "maxrss", "inblock", "oublock"]
+
+metrics.describe(
+    "parrot_rcc_task_runs_total", "counter", "Robot runs with recorded usage."
+)
+metrics.describe(
+    "parrot_rcc_task_wall_seconds_total", "counter", "Wall time of robot runs."
+)
+metrics.describe(
+    "parrot_rcc_task_cpu_seconds_total", "counter", "CPU time of robot runs."
+)
+metrics.describe(
+    "parrot_rcc_task_block_io_total",
+    "counter",
+    "Blocks read (in) and written (out) by robot runs.",
+)
+metrics.describe(
+    "parrot_rcc_task_max_rss_bytes",
+    "gauge",
+    "Peak resident set size of the largest process of any robot run.",
+)
+
+
+def read_usage(path: str) -> Dict[str, float]:
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            return json.loads(fp.read())
+    except (OSError, ValueError):
+        return {}
+
+
+class TaskUsage:
+    """Resource usage of robot runs aggregated by task."""
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict[str, float]] = {}
+
+    def record(self, task: str, usage: Dict[str, float]):
+        totals = self.tasks.setdefault(task, {"runs": 0} | dict.fromkeys(FIELDS, 0))
+        totals["runs"] += 1
+        for field in FIELDS:
+            if field == "maxrss":
+                totals[field] = max(totals[field], usage.get(field, 0))
+            else:
+                totals[field] += usage.get(field, 0)
+
+        metrics.inc("parrot_rcc_task_runs_total", task=task)
+        metrics.inc(
+            "parrot_rcc_task_wall_seconds_total", usage.get("wall", 0), task=task
+        )
+        metrics.inc(
+            "parrot_rcc_task_cpu_seconds_total",
+            usage.get("user", 0),
+            task=task,
+            mode="user",
+        )
+        metrics.inc(
+            "parrot_rcc_task_cpu_seconds_total",
+            usage.get("system", 0),
+            task=task,
+            mode="system",
+        )
+        metrics.inc(
+            "parrot_rcc_task_block_io_total",
+            usage.get("inblock", 0),
+            task=task,
+            direction="in",
+        )
+        metrics.inc(
+            "parrot_rcc_task_block_io_total",
+            usage.get("oublock", 0),
+            task=task,
+            direction="out",
+        )
+        metrics.set("parrot_rcc_task_max_rss_bytes", totals["maxrss"], task=task)
+
+    def peak_rss(self, task: str) -> int:
+        return int(self.tasks.get(task, {}).get("maxrss", 0))
+
+
+task_usage = TaskUsage()
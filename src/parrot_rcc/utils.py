@@ -1,12 +1,28 @@
+from contextvars import ContextVar
 from io import BytesIO
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 from parrot_rcc.types import LogLevel
-from PIL import Image
+from typing import Awaitable
+from typing import Dict
+from typing import Iterable
+from typing import List
 from urllib.parse import unquote
+import asyncio
+import atexit
 import base64
 import binascii
+import importlib
+import json
 import logging
 import os
+import queue
 import re
+import time
+
+
+# Fields of the job being executed in the current asyncio task
+job_context: ContextVar[Dict] = ContextVar("job_context", default={})
 
 
 class DefaultFormatter(logging.Formatter):
@@ -29,10 +45,14 @@ class DefaultFormatter(logging.Formatter):
         logging.CRITICAL: timestamp + bold_red + level + reset + message,
     }
 
+    def __init__(self):
+        super().__init__()
+        self.formatters = {
+            level: logging.Formatter(log_fmt) for level, log_fmt in self.FORMATS.items()
+        }
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self.formatters.get(record.levelno, super()).format(record)
 
 
 class DebugFormatter(DefaultFormatter):
@@ -43,7 +63,43 @@ class DebugFormatter(DefaultFormatter):
     }
 
 
-def setup_logging(logger: logging.Logger, log_level: LogLevel, debug: bool = False):
+class JsonFormatter(logging.Formatter):
+    def __init__(self, debug: bool = False):
+        super().__init__()
+        self.debug = debug
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        } | getattr(record, "job", {})
+        if self.debug:
+            data["location"] = f"{record.filename}:{record.lineno}"
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class JobContextFilter(logging.Filter):
+    def filter(self, record):
+        record.job = job_context.get()
+        return True
+
+
+class LogQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Messages are formatted by the listener thread instead of the event loop
+        return record
+
+
+def setup_logging(
+    logger: logging.Logger,
+    log_level: LogLevel,
+    debug: bool = False,
+    log_format: str = "text",
+):
     # create logger with 'spam_application'
     logger.setLevel(f"{log_level}")
 
@@ -51,12 +107,61 @@ def setup_logging(logger: logging.Logger, log_level: LogLevel, debug: bool = Fal
     ch = logging.StreamHandler()
     ch.setLevel(f"{log_level}")
 
-    ch.setFormatter(DebugFormatter() if debug else DefaultFormatter())
+    if log_format == "json":
+        ch.setFormatter(JsonFormatter(debug))
+    else:
+        ch.setFormatter(DebugFormatter() if debug else DefaultFormatter())
+
+    # console handler is run in a separate thread
+    qh = LogQueueHandler(queue.SimpleQueue())
+    qh.addFilter(JobContextFilter())
+    listener = QueueListener(qh.queue, ch, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(qh)
+
+
+class Timings:
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.phases = {}
 
-    logger.addHandler(ch)
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = now - self.last
+        self.last = now
+
+    def __str__(self):
+        return ", ".join(
+            [f"{phase} {duration:.3f}s" for phase, duration in self.phases.items()]
+            + [f"total {self.last - self.started:.3f}s"]
+        )
+
+
+async def gather_limited(limit: int, aws: Iterable[Awaitable]) -> List:
+    """Gather results of awaitables with at most limit of them awaited at once."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def limited(aw: Awaitable):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*[limited(aw) for aw in aws])
+
+
+def preload(*modules: str):
+    # Heavy modules are imported in the background before the first job
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except (ImportError, TypeError):
+            pass
 
 
 def inline_screenshots(file_path: str):
+    from PIL import Image
+
     data = None
     mimetype = None
     cwd = os.getcwd()
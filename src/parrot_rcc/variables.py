@@ -0,0 +1,54 @@
+from parrot_rcc.s3 import s3_get_object
+from parrot_rcc.s3 import s3_put_object
+from typing import Any
+from typing import Dict
+from urllib.parse import quote
+import asyncio
+import json
+
+
+# Large variables are stored in S3 and replaced with {"$s3": "s3://bucket/key"}
+REFERENCE = "$s3"
+
+
+def is_reference(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and len(value) == 1
+        and isinstance(value.get(REFERENCE), str)
+        and value[REFERENCE].startswith("s3://")
+    )
+
+
+async def offload_variables(
+    s3_client: Any, variables: Dict, bucket: str, prefix: str, threshold: int
+) -> Dict:
+    """Replace variables larger than threshold bytes with S3 references."""
+    if not threshold:
+        return variables
+    offloaded = {}
+    for name, value in variables.items():
+        body = json.dumps(value).encode("utf-8")
+        if len(body) > threshold and not is_reference(value):
+            key = f"{prefix.strip('/')}/{quote(name, safe='')}.json"
+            await s3_put_object(s3_client, bucket, key, body, "application/json")
+            offloaded[name] = {REFERENCE: f"s3://{bucket}/{key}"}
+        else:
+            offloaded[name] = value
+    return offloaded
+
+
+async def resolve_variables(s3_client: Any, variables: Dict) -> Dict:
+    """Replace S3 references with the variable values they refer to."""
+    names = [name for name, value in variables.items() if is_reference(value)]
+    bodies = await asyncio.gather(
+        *[
+            s3_get_object(
+                s3_client, *variables[name][REFERENCE][len("s3://") :].split("/", 1)
+            )
+            for name in names
+        ]
+    )
+    return variables | {
+        name: json.loads(body.decode("utf-8")) for name, body in zip(names, bodies)
+    }
@@ -0,0 +1,56 @@
+from parrot_rcc.breaker import CircuitBreaker
+from parrot_rcc.types import Options
+from typing import Dict
+import asyncio
+
+
+def vault_failure(error: BaseException) -> bool:
+    # Only connection errors and server errors indicate that Vault is unavailable
+    import aiohttp
+
+    cause = error.__cause__ or error
+    if isinstance(cause, aiohttp.ClientResponseError):
+        return cause.status >= 500
+    return isinstance(cause, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+vault_breaker = CircuitBreaker("Vault", vault_failure)
+
+
+async def vault_probe(config: Options):
+    import aiohttp
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        async with session.get(
+            f"{config.vault_addr.strip('/')}/v1/sys/health"
+        ) as vault_resp:
+            # Standby and performance standby nodes are also available
+            if vault_resp.status not in (200, 429, 472, 473):
+                vault_resp.raise_for_status()
+
+
+@vault_breaker
+async def fetch_secrets(vault: Dict[str, str], config: Options) -> Dict[str, Dict]:
+    import aiohttp
+
+    vault_json_data = {}
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=5),
+        headers={
+            "Accept": "application/json",
+            "X-Vault-Token": config.vault_token,
+        },
+    ) as session:
+        for secret_name, secret_path in vault.items():
+            vault_url = f"{config.vault_addr.strip('/')}/{secret_path.strip('/')}"
+            vault_resp = None
+            try:
+                vault_resp = await session.get(vault_url)
+                if vault_resp.status >= 500:
+                    vault_resp.raise_for_status()
+                vault_json_data[secret_name] = (await vault_resp.json())["data"]["data"]
+            except Exception as e:
+                raise Exception(
+                    f'Task secret "{secret_name}" at "{secret_path}" could not be loaded: {vault_resp or e}'
+                ) from e
+    return vault_json_data
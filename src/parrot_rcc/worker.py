@@ -0,0 +1,124 @@
+from parrot_rcc.admission import Slots
+from parrot_rcc.poller import Poller
+from parrot_rcc.streaming import JobStreamer
+from pyzeebe import ZeebeWorker
+from pyzeebe.errors import TaskNotFoundError
+from pyzeebe.task.task import Task
+from pyzeebe.worker.job_executor import JobExecutor
+from pyzeebe.worker.task_state import TaskState
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class Worker(ZeebeWorker):
+    """ZeebeWorker, which allows tasks to be added and removed while working.
+
+    With streaming, jobs are pushed by the gateway while the slots have
+    capacity for them. No jobs are activated for tasks while paused, and
+    jobs for delayed tasks are activated only after their delay.
+    """
+
+    def __init__(
+        self,
+        *args,
+        streaming: bool = False,
+        slots: Optional[Slots] = None,
+        paused: Callable[[str], bool] = lambda task_type: False,
+        delay: Callable[[str], float] = lambda task_type: 0,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.streaming = streaming
+        self.slots = slots
+        self.paused = paused
+        self.delay = delay
+        self._running: Dict[
+            str, Tuple[Poller, JobExecutor, asyncio.Future, asyncio.Future]
+        ] = {}
+        self._stopped = None
+
+    async def work(self) -> None:
+        self._stopped = asyncio.Event()
+        for task in self.tasks:
+            self._start(task)
+        self._work_task = asyncio.ensure_future(self._stopped.wait())
+        try:
+            await self._work_task
+        except asyncio.CancelledError:
+            logger.info("Zeebe worker was stopped")
+
+    def _start(self, task: Task):
+        jobs_queue: asyncio.Queue = asyncio.Queue()
+        task_state = TaskState()
+        args = (
+            self.zeebe_adapter,
+            task,
+            jobs_queue,
+            self.name,
+            self.request_timeout,
+            task_state,
+            self.poll_retry_delay,
+        )
+        poller = (
+            JobStreamer(*args, slots=self.slots, paused=self.paused, delay=self.delay)
+            if self.streaming
+            else Poller(*args, paused=self.paused, delay=self.delay)
+        )
+        executor = JobExecutor(task, jobs_queue, task_state)
+        polling = asyncio.ensure_future(poller.poll())
+        executing = asyncio.ensure_future(executor.execute())
+        asyncio.gather(polling, executing).add_done_callback(on_done(task))
+        self._running[task.type] = poller, executor, polling, executing
+        self._job_pollers.append(poller)
+        self._job_executors.append(executor)
+
+    def add_task(self, task: Task) -> None:
+        self._add_task(task)
+        if self._stopped is not None and not self._stopped.is_set():
+            self._start(task)
+
+    async def discard_task(self, task_type: str) -> None:
+        """Stop polling jobs for the task and wait for its running jobs."""
+        try:
+            self.remove_task(task_type)
+        except TaskNotFoundError:
+            return
+        if task_type not in self._running:
+            return
+        poller, executor, polling, executing = self._running.pop(task_type)
+        self._job_pollers.remove(poller)
+        self._job_executors.remove(executor)
+        # Activation in flight must not deliver jobs after the executor has stopped
+        poller.stop_event.set()
+        polling.cancel()
+        await asyncio.gather(polling, return_exceptions=True)
+        await poller.stop()
+        await executor.stop()
+        executing.cancel()
+
+    async def stop(self) -> None:
+        if self._stopped is not None:
+            self._stopped.set()
+        await super().stop()
+        for poller, executor, polling, executing in self._running.values():
+            polling.cancel()
+            executing.cancel()
+        self._running.clear()
+
+
+def on_done(task: Task):
+    def callback(future: asyncio.Future):
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception and not isinstance(exception, asyncio.CancelledError):
+            logger.error("Polling jobs for task %s failed: %s", task.type, exception)
+
+    return callback
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+# Removals are serialized to keep them from competing with running robots
+cleanup_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def disk_usage(path: Path) -> int:
+    usage = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                usage += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return usage
+
+
+def remove(path: Path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class JobWorkspace:
+    def __init__(self, path: Path):
+        self.path = path
+        self.robot_dir = path / "robot"
+        self.data_dir = path / "data"
+        self.usage = 0
+        self.exceeded = False
+
+
+class Workspace:
+    """Scratch directories for jobs under a configurable work root.
+
+    Every worker process owns a locked instance directory below the root.
+    Instance directories left behind by terminated workers are removed
+    on startup, and finished job directories are removed in the background.
+    """
+
+    def __init__(self, root: str = "", quota_mb: int = 0, interval: float = 5):
+        # Work root is shared with the robot package cache by default
+        self.root = Path(root or tempfile.gettempdir()) / "parrot-rcc" / "work"
+        self.quota = quota_mb * 1024 * 1024
+        self.interval = interval
+        self.path = None
+        self._lock = None
+
+    def start(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        for path in self.root.iterdir():
+            if path.is_dir() and not is_locked(path):
+                logger.info("Removing stale work directory %s", path)
+                self.discard(path)
+        self.path = self.root / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.path.mkdir()
+        self._lock = open(self.path / ".lock", "w")
+        fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def discard(self, path: Path):
+        # Rename is instant, recursive removal may take long for large trees
+        trash = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}")
+        try:
+            path.rename(trash)
+        except OSError:
+            trash = path
+        asyncio.get_event_loop().run_in_executor(cleanup_executor, remove, trash)
+
+    @asynccontextmanager
+    async def job(self, name: str) -> AsyncIterator[JobWorkspace]:
+        if self.path is None:
+            self.start()
+        path = Path(tempfile.mkdtemp(prefix=f"{name}-", dir=self.path))
+        workspace = JobWorkspace(path)
+        workspace.robot_dir.mkdir()
+        workspace.data_dir.mkdir()
+        try:
+            yield workspace
+        finally:
+            self.discard(path)
+
+    async def measure(self, workspace: JobWorkspace) -> int:
+        workspace.usage = await asyncio.get_event_loop().run_in_executor(
+            None, disk_usage, workspace.path
+        )
+        return workspace.usage
+
+    async def watch(self, workspace: JobWorkspace, stop: asyncio.Event):
+        """Set stop when the job workspace exceeds its quota."""
+        while self.quota and not stop.is_set():
+            await asyncio.sleep(self.interval)
+            if await self.measure(workspace) > self.quota:
+                logger.warning(
+                    "Work directory %s exceeded quota of %s bytes",
+                    workspace.path,
+                    self.quota,
+                )
+                workspace.exceeded = True
+                stop.set()
+
+
+def is_locked(path: Path) -> bool:
+    try:
+        with open(path / ".lock", "r") as fp:
+            try:
+                fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(fp, fcntl.LOCK_UN)
+    except FileNotFoundError:
+        pass
+    return False
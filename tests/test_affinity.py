@@ -0,0 +1,77 @@
+from parrot_rcc.affinity import Affinity
+from parrot_rcc.affinity import environment_hash
+from parrot_rcc.gateway import FakeGateway
+from tests.utils import build_task
+from tests.utils import create_worker
+from tests.utils import wait_until
+from zipfile import ZipFile
+import asyncio
+import collections
+import pytest
+
+
+NODES = ["node-1", "node-2"]
+
+
+@pytest.fixture
+def robot(tmp_path):
+    path = tmp_path / "robot.zip"
+    with ZipFile(path, "w") as fp:
+        fp.writestr("robot.yaml", "tasks: {}\ncondaConfigFile: conda.yaml\n")
+        fp.writestr("conda.yaml", "dependencies: [python=3.9]\n")
+    return str(path)
+
+
+async def run_jobs(robot: str, count: int, duration: float, max_jobs: int):
+    gateway = FakeGateway()
+    port = await gateway.start()
+    executed = collections.Counter()
+    workers = []
+    for node in NODES:
+        affinity = Affinity()
+        affinity.configure(NODES, node, 500, None)
+
+        async def handler(node=node, **kwargs):
+            executed[node] += 1
+            await asyncio.sleep(duration)
+
+        worker = create_worker(
+            port,
+            name=node,
+            delay=lambda task_type, affinity=affinity: affinity.delay(robot),
+        )
+        worker.add_task(build_task("A", handler, max_jobs))
+        workers.append(worker)
+    working = [asyncio.ensure_future(worker.work()) for worker in workers]
+    try:
+        # Jobs are added between the delayed polls of other nodes
+        await asyncio.sleep(0.25)
+        for i in range(count):
+            await gateway.add_job("A", {"index": i})
+            await asyncio.sleep(0.05)
+        await wait_until(lambda: len(gateway.completed) == count)
+        return executed
+    finally:
+        for worker in workers:
+            await worker.stop()
+        await asyncio.gather(*working, return_exceptions=True)
+        await gateway.stop()
+
+
+def owner(robot: str) -> str:
+    affinity = Affinity()
+    affinity.configure(NODES, NODES[0], 500, None)
+    return affinity.ring.owner(environment_hash(robot))
+
+
+def test_owner_gets_jobs_first(robot):
+    executed = asyncio.run(run_jobs(robot, 4, 0.01, 10))
+    assert executed == {owner(robot): 4}
+
+
+def test_other_node_takes_jobs_from_saturated_owner(robot):
+    executed = asyncio.run(run_jobs(robot, 4, 1, 1))
+    other = next(node for node in NODES if node != owner(robot))
+    assert executed[owner(robot)] > 0
+    assert executed[other] > 0
+    assert sum(executed.values()) == 4
@@ -0,0 +1,64 @@
+from parrot_rcc.batch import Batcher
+from parrot_rcc.batch import parse_batch
+from parrot_rcc.batch import WorkItem
+from parrot_rcc.types import RobotTask
+import asyncio
+import time
+
+
+def item(key: int) -> WorkItem:
+    return WorkItem(key, key, key, {"key": key})
+
+
+def test_parse_batch():
+    assert parse_batch(10) == (10, 500)
+    assert parse_batch("10,100") == (10, 100)
+
+
+def test_batches_are_executed_at_size_or_after_window():
+    async def main():
+        batches = []
+
+        async def execute(robot_task, items):
+            batches.append((robot_task.robot, [item.job for item in items]))
+            return [{"key": item.job} for item in items]
+
+        batcher = Batcher(execute)
+        a = RobotTask("T", "a.zip", {}, batch_size=2, batch_window_ms=200)
+        b = RobotTask("T", "b.zip", {}, batch_size=2, batch_window_ms=200)
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *[batcher.submit(a, item(key)) for key in (1, 2, 3)],
+            batcher.submit(b, item(4)),
+        )
+        assert results == [{"key": key} for key in (1, 2, 3, 4)]
+        assert batches[0] == ("a.zip", [1, 2])
+        assert sorted(batches[1:]) == [("a.zip", [3]), ("b.zip", [4])]
+        assert 0.2 <= time.monotonic() - started < 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_jobs_are_left_out_of_their_batch():
+    async def main():
+        batches = []
+
+        async def execute(robot_task, items):
+            batches.append([item.job for item in items])
+            return [ValueError("failed")] + [{} for item in items[1:]]
+
+        batcher = Batcher(execute)
+        robot_task = RobotTask("T", "a.zip", {}, batch_size=3, batch_window_ms=100)
+        submitted = [
+            asyncio.ensure_future(batcher.submit(robot_task, item(key)))
+            for key in (1, 2, 3)
+        ]
+        await asyncio.sleep(0)
+        submitted[0].cancel()
+        results = await asyncio.gather(*submitted, return_exceptions=True)
+        assert batches == [[2, 3]]
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert isinstance(results[1], ValueError)
+        assert results[2] == {}
+
+    asyncio.run(main())
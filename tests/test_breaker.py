@@ -0,0 +1,88 @@
+from parrot_rcc.breaker import CircuitBreaker
+from parrot_rcc.cli import on_error
+from parrot_rcc.errors import ServiceUnavailableError
+from parrot_rcc.s3 import s3_breaker
+from tests.utils import wait_until
+from types import SimpleNamespace
+import asyncio
+import pytest
+
+
+def test_breaker_opens_after_threshold_failures():
+    async def main():
+        breaker = CircuitBreaker("Service", lambda e: isinstance(e, OSError), 2, 0.1)
+        calls = []
+
+        @breaker
+        async def call(error=None):
+            calls.append(error)
+            if error is not None:
+                raise error
+
+        # Only recognized failures are counted
+        with pytest.raises(ValueError):
+            await call(ValueError())
+        with pytest.raises(OSError):
+            await call(OSError())
+        await call()
+        with pytest.raises(OSError):
+            await call(OSError())
+        assert not breaker.is_open
+        with pytest.raises(OSError):
+            await call(OSError())
+        assert breaker.is_open
+
+        # Calls fail fast while the breaker is open
+        with pytest.raises(ServiceUnavailableError):
+            await call()
+        assert len(calls) == 5
+
+        # Without a probe, the next call is let through after the interval
+        await wait_until(lambda: not breaker.is_open, timeout=1)
+        await call()
+        assert len(calls) == 6
+
+    asyncio.run(main())
+
+
+def test_breaker_recovers_when_probe_succeeds():
+    async def main():
+        available = False
+
+        async def probe():
+            if not available:
+                raise OSError()
+
+        breaker = CircuitBreaker("Service")
+        breaker.configure(probe, 1, 0.05)
+        breaker.failure(OSError())
+        assert breaker.is_open
+        await asyncio.sleep(0.2)
+        assert breaker.is_open
+
+        available = True
+        await wait_until(lambda: not breaker.is_open, timeout=1)
+
+        # Next failure opens the breaker again
+        breaker.failure(OSError())
+        assert breaker.is_open
+        await wait_until(lambda: not breaker.is_open, timeout=1)
+
+    asyncio.run(main())
+
+
+def test_unavailable_service_keeps_job_retries():
+    async def fail_job(**kwargs):
+        failed.update(kwargs)
+
+    failed = {}
+    job = SimpleNamespace(
+        key=1, retries=2, zeebe_adapter=SimpleNamespace(fail_job=fail_job)
+    )
+    asyncio.run(on_error(ServiceUnavailableError(s3_breaker.name), job))
+    assert failed == {
+        "job_key": 1,
+        "retries": 2,
+        "message": "S3 is unavailable",
+        "retry_back_off": int(s3_breaker.interval * 1000),
+    }
@@ -0,0 +1,74 @@
+from parrot_rcc.gateway import FakeGateway
+from pyzeebe import Job
+from pyzeebe.errors import JobNotFoundError
+from tests.utils import build_task
+from tests.utils import create_worker
+from tests.utils import wait_until
+import asyncio
+import pytest
+import time
+
+
+async def fail_job(exception: Exception, job: Job):
+    await job.zeebe_adapter.fail_job(
+        job_key=job.key, retries=2, message=str(exception), retry_back_off=500
+    )
+
+
+async def run_job(handler, timeout_ms: int = 10000):
+    gateway = FakeGateway()
+    port = await gateway.start()
+    worker = create_worker(port)
+    task = build_task("A", handler, exception_handler=fail_job)
+    task.config.timeout_ms = timeout_ms
+    worker.add_task(task)
+    working = asyncio.ensure_future(worker.work())
+    try:
+        key = await gateway.add_job("A", {})
+        await wait_until(lambda: key in gateway.completed)
+        return gateway, key
+    finally:
+        await worker.stop()
+        await asyncio.gather(working, return_exceptions=True)
+        await gateway.stop()
+
+
+def test_failed_job_is_retried_after_backoff():
+    attempts = []
+
+    async def handler(**kwargs):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise ValueError("failed")
+
+    gateway, key = asyncio.run(run_job(handler))
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.5
+    assert gateway.failed[key].retries == 2
+
+
+def test_timed_out_job_is_activated_again():
+    attempts = []
+
+    async def handler(**kwargs):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            await asyncio.sleep(1)
+
+    gateway, key = asyncio.run(run_job(handler, timeout_ms=300))
+    assert len(attempts) == 2
+    assert gateway.workers[key] == ["worker", "worker"]
+
+
+def test_outcome_of_inactive_job_is_rejected():
+    async def main():
+        gateway = FakeGateway()
+        port = await gateway.start()
+        worker = create_worker(port)
+        try:
+            with pytest.raises(JobNotFoundError):
+                await worker.zeebe_adapter.complete_job(job_key=1, variables={})
+        finally:
+            await gateway.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+from parrot_rcc.jobs import JobRegistry
+from types import SimpleNamespace
+import asyncio
+
+
+def test_jobs_are_not_cancelled_after_their_robot_run():
+    async def main():
+        registry = JobRegistry()
+        job = SimpleNamespace(
+            key=1, type="A", process_instance_key=1, element_instance_key=1
+        )
+        with registry.track(job) as running:
+            stop = asyncio.Event()
+            registry.update([1], phase="running", stop=stop)
+            assert registry.cancel(1, "first")
+            assert stop.is_set()
+
+            registry.update([1], phase="saving", stop=None)
+            running.cancelled = None
+            assert not registry.cancel(1, "second")
+            assert registry.cancelled(1) is None
+        assert 1 not in registry
+        assert not registry.cancel(1, "third")
+
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+from parrot_rcc import launcher
+from parrot_rcc.errors import LimitUnavailableError
+from parrot_rcc.limits import create_cgroup
+import pytest
+import subprocess
+import sys
+
+
+def test_existing_cgroup_is_not_removed(tmp_path):
+    (tmp_path / "parrot-1").mkdir()
+    with pytest.raises(LimitUnavailableError):
+        create_cgroup(str(tmp_path), "1", {"memory": 1})
+    assert (tmp_path / "parrot-1").exists()
+
+
+def test_launcher_fails_clearly_without_limits(tmp_path):
+    result = subprocess.run(
+        [sys.executable, launcher.__file__, "--cgroup", str(tmp_path / "missing")]
+        + ["--", "true"],
+        capture_output=True,
+    )
+    assert result.returncode == launcher.LIMITS_FAILED
+    assert result.stderr.startswith(b"Limits could not be applied")
@@ -0,0 +1,74 @@
+from aiohttp import web
+from aiohttp.test_utils import TestClient
+from aiohttp.test_utils import TestServer
+from parrot_rcc.healthz import Healthz
+from parrot_rcc.links import s3_link
+from parrot_rcc.types import Options
+from tests.utils import FakeS3Client
+from urllib.parse import urlsplit
+import asyncio
+
+
+CONFIG = Options(
+    rcc_s3_bucket_logs="logs",
+    rcc_s3_bucket_data="data",
+    rcc_s3_redirect_url="http://worker:8001/",
+    rcc_s3_redirect_secret="secret",
+)
+
+
+def test_s3_link_without_redirect_is_presigned():
+    config = Options(rcc_s3_url_expires_in=60)
+    link = asyncio.run(s3_link(FakeS3Client(), config, "logs", "1/2/log.html"))
+    assert link == "https://s3/logs/1/2/log.html?expires=60"
+
+
+def test_s3_link_is_verified_before_redirect():
+    async def main():
+        healthz = Healthz(None, CONFIG)
+        healthz.s3_client = FakeS3Client()
+        app = web.Application()
+        app.add_routes([web.get("/s3/{bucket}/{key:.+}", healthz.s3_redirect)])
+        async with TestClient(TestServer(app)) as client:
+            link = await s3_link(None, CONFIG, "logs", "1/2/log file.html")
+            assert link.startswith("http://worker:8001/s3/logs/1/2/log%20file.html?")
+            url = urlsplit(link)
+            response = await client.get(
+                f"{url.path}?{url.query}", allow_redirects=False
+            )
+            assert response.status == 302
+            assert response.headers["Location"].startswith(
+                "https://s3/logs/1/2/log%20file.html"
+            )
+
+            # Token is only valid for the signed object
+            token = url.query
+            response = await client.get(
+                f"/s3/logs/1/2/other.html?{token}", allow_redirects=False
+            )
+            assert response.status == 403
+            response = await client.get(
+                "/s3/logs/1/2/log%20file.html?token=x", allow_redirects=False
+            )
+            assert response.status == 403
+
+            # Links of other workers' secrets are rejected
+            other = await s3_link(
+                None,
+                Options(**(CONFIG.__dict__ | {"rcc_s3_redirect_secret": "other"})),
+                "logs",
+                "1/2/log file.html",
+            )
+            response = await client.get(
+                urlsplit(other).path + "?" + urlsplit(other).query,
+                allow_redirects=False,
+            )
+            assert response.status == 403
+
+            # Only the configured buckets are redirected to
+            response = await client.get(
+                f"/s3/other/1/2/log%20file.html?{token}", allow_redirects=False
+            )
+            assert response.status == 404
+
+    asyncio.run(main())
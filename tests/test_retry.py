@@ -0,0 +1,61 @@
+from parrot_rcc.cli import on_error
+from parrot_rcc.errors import ItemReleaseWithFailure
+from parrot_rcc.retry import ATTEMPT_VARIABLE
+from parrot_rcc.retry import parse_retry
+from parrot_rcc.retry import RetryPolicy
+from types import SimpleNamespace
+import asyncio
+
+
+def test_parse_retry():
+    assert parse_retry("retries=5,codes=A|B") == RetryPolicy(
+        backoff_ms=10000, retries=5, codes=["A", "B"]
+    )
+    assert parse_retry(
+        {"backoff": 100, "max_backoff": 1000, "multiplier": 3, "codes": ["A"]}
+    ) == RetryPolicy(backoff_ms=100, max_backoff_ms=1000, multiplier=3, codes=["A"])
+
+
+def test_backoff_grows_from_the_first_attempt():
+    policy = parse_retry("backoff=10000,retries=5,jitter=0")
+    assert [policy.backoff(attempt) for attempt in range(4)] == [
+        10000,
+        20000,
+        40000,
+        80000,
+    ]
+    assert policy.backoff(10) == 600000
+    policy = parse_retry("backoff=10000,jitter=0.2")
+    assert all(8000 <= policy.backoff(0) <= 12000 for i in range(100))
+
+
+def test_retries_are_capped_to_the_policy():
+    policy = parse_retry("retries=2,codes=A")
+    assert [policy.remaining(retries) for retries in (5, 2, 1, 0)] == [1, 1, 0, 0]
+    assert policy.is_retryable("A")
+    assert not policy.is_retryable("B")
+    assert parse_retry("retries=2").is_retryable("B")
+
+
+def test_failed_attempts_are_counted_in_job_variables():
+    async def set_variables(element_instance_key, variables, local):
+        saved.update(variables)
+
+    async def fail_job(**kwargs):
+        failed.append(kwargs)
+
+    policy = parse_retry("backoff=10000,retries=5,jitter=0")
+    saved, failed = {}, []
+    job = SimpleNamespace(
+        key=1,
+        element_instance_key=1,
+        zeebe_adapter=SimpleNamespace(set_variables=set_variables, fail_job=fail_job),
+    )
+    # Job has fewer retries than the policy
+    for retries in (3, 2, 1):
+        job.retries, job.variables = retries, dict(saved)
+        exception = ItemReleaseWithFailure("failed", code="A", payload={"a": 1})
+        asyncio.run(on_error(exception, job, policy))
+    assert [call["retries"] for call in failed] == [2, 1, 0]
+    assert [call["retry_back_off"] for call in failed] == [10000, 20000, 0]
+    assert saved == {"a": 1, ATTEMPT_VARIABLE: 3}
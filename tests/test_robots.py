@@ -0,0 +1,28 @@
+from parrot_rcc.cli import variables_to_fetch
+from parrot_rcc.robots import robot_tasks
+from parrot_rcc.types import Options
+from pathlib import Path
+
+
+ROBOT_YAML = {
+    "tasks": {"Task A": {}, "Task B": {}, "Task C": {}},
+    "variables": {"Task A": ["a", "b"], "Task B": ["b"]},
+}
+
+
+def test_task_variables_override_robot_yaml():
+    config = Options(task_variables="Task B=c, d;Task C=")
+    tasks = robot_tasks(Path("robot.zip"), ROBOT_YAML, config)
+    assert tasks["Task A"].variables == ["a", "b"]
+    assert tasks["Task B"].variables == ["c", "d"]
+    assert tasks["Task C"].variables == []
+
+
+def test_variables_to_fetch_include_business_key():
+    config = Options(task_variables="Task C=")
+    tasks = robot_tasks(Path("robot.zip"), ROBOT_YAML | {"variables": {}}, config)
+    assert variables_to_fetch(tasks["Task A"], config) == []
+    assert variables_to_fetch(tasks["Task C"], config) == ["businessKey"]
+    tasks = robot_tasks(Path("robot.zip"), ROBOT_YAML, Options(business_key=""))
+    assert variables_to_fetch(tasks["Task A"], config) == ["a", "b", "businessKey"]
+    assert variables_to_fetch(tasks["Task B"], Options(business_key="")) == ["b"]
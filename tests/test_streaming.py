@@ -0,0 +1,79 @@
+from parrot_rcc.admission import Slots
+from parrot_rcc.gateway import FakeGateway
+from tests.utils import build_task
+from tests.utils import create_worker
+from tests.utils import wait_until
+import asyncio
+import pytest
+
+
+async def run_jobs(gateway_streaming: bool, worker_streaming: bool, count: int = 3):
+    gateway = FakeGateway(streaming=gateway_streaming)
+    port = await gateway.start()
+    worker = create_worker(port, streaming=worker_streaming, slots=Slots(2))
+    worker.add_task(build_task("A", lambda **kwargs: asyncio.sleep(0.01)))
+    working = asyncio.ensure_future(worker.work())
+    try:
+        # Jobs created after the worker started are streamed when supported
+        await asyncio.sleep(0.5)
+        keys = [await gateway.add_job("A", {"index": i}) for i in range(count)]
+        await wait_until(lambda: len(gateway.completed) == count)
+        assert sorted(gateway.completed) == keys
+        return gateway
+    finally:
+        await worker.stop()
+        await asyncio.gather(working, return_exceptions=True)
+        await gateway.stop()
+
+
+def test_streamed_jobs_are_completed():
+    gateway = asyncio.run(run_jobs(True, True))
+    assert gateway.streamed == 3
+
+
+@pytest.mark.parametrize(
+    "gateway_streaming,worker_streaming", [(True, False), (False, True)]
+)
+def test_jobs_are_polled_without_streaming(gateway_streaming, worker_streaming):
+    gateway = asyncio.run(run_jobs(gateway_streaming, worker_streaming))
+    assert gateway.streamed == 0
+    assert gateway.activations == 3
+
+
+def test_stream_is_not_read_without_capacity():
+    async def main():
+        gateway = FakeGateway()
+        port = await gateway.start()
+        slots = Slots(1)
+        release = asyncio.Event()
+        started = []
+
+        async def handler(**kwargs):
+            async with slots.acquire("A"):
+                started.append(kwargs["index"])
+                await release.wait()
+
+        worker = create_worker(port, streaming=True, slots=slots)
+        worker.add_task(build_task("A", handler))
+        working = asyncio.ensure_future(worker.work())
+        try:
+            await asyncio.sleep(0.5)
+            for i in range(3):
+                await gateway.add_job("A", {"index": i})
+            await wait_until(lambda: started)
+            await asyncio.sleep(1)
+            poller = worker._running["A"][0]
+            assert started == [0]
+            assert poller.task_state.count_active() == 1
+            assert poller.queue.empty()
+
+            release.set()
+            await wait_until(lambda: len(gateway.completed) == 3)
+            assert sorted(started) == [0, 1, 2]
+        finally:
+            release.set()
+            await worker.stop()
+            await asyncio.gather(working, return_exceptions=True)
+            await gateway.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+from parrot_rcc.variables import is_reference
+from parrot_rcc.variables import offload_variables
+from parrot_rcc.variables import resolve_variables
+from tests.utils import FakeS3Client
+import asyncio
+
+
+VARIABLES = {"small": "x", "large item": ["y" * 100], "number": 1}
+
+
+def test_large_variables_are_offloaded_and_resolved():
+    s3_client = FakeS3Client()
+    offloaded = asyncio.run(
+        offload_variables(s3_client, VARIABLES, "data", "/variables/1/2/", 50)
+    )
+    assert offloaded["small"] == "x"
+    assert offloaded["number"] == 1
+    assert offloaded["large item"] == {
+        "$s3": "s3://data/variables/1/2/large%20item.json"
+    }
+    assert ("data", "variables/1/2/large%20item.json") in s3_client.objects
+    assert asyncio.run(resolve_variables(s3_client, offloaded)) == VARIABLES
+
+
+def test_variables_are_not_offloaded_without_threshold():
+    s3_client = FakeS3Client()
+    assert asyncio.run(offload_variables(s3_client, VARIABLES, "data", "", 0)) == (
+        VARIABLES
+    )
+    assert not s3_client.objects
+
+
+def test_references_are_not_offloaded_again():
+    reference = {"$s3": "s3://data/" + "k" * 100}
+    offloaded = asyncio.run(
+        offload_variables(FakeS3Client(), {"value": reference}, "data", "", 10)
+    )
+    assert offloaded == {"value": reference}
+
+
+def test_is_reference():
+    assert is_reference({"$s3": "s3://bucket/key"})
+    assert not is_reference({"$s3": "https://bucket/key"})
+    assert not is_reference({"$s3": "s3://bucket/key", "other": 1})
+    assert not is_reference("s3://bucket/key")
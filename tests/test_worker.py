@@ -0,0 +1,33 @@
+from parrot_rcc.gateway import FakeGateway
+from tests.utils import build_task
+from tests.utils import create_worker
+from tests.utils import wait_until
+import asyncio
+
+
+def test_discarded_task_activates_no_more_jobs():
+    async def main():
+        gateway = FakeGateway(streaming=False)
+        port = await gateway.start()
+        worker = create_worker(port)
+        worker.add_task(build_task("A", lambda **kwargs: asyncio.sleep(0)))
+        working = asyncio.ensure_future(worker.work())
+        try:
+            # Long polling request is in flight while the task is discarded
+            await asyncio.sleep(0.3)
+            await worker.discard_task("A")
+            # Gateway sees the cancelled request after the worker has sent it
+            await asyncio.sleep(0.2)
+            await gateway.add_job("A", {})
+            await asyncio.sleep(1.5)
+            assert gateway.activations == 0
+            assert len(gateway.jobs["A"]) == 1
+
+            worker.add_task(build_task("A", lambda **kwargs: asyncio.sleep(0)))
+            await wait_until(lambda: len(gateway.completed) == 1)
+        finally:
+            await worker.stop()
+            await asyncio.gather(working, return_exceptions=True)
+            await gateway.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+from parrot_rcc.adapter import ZeebeRetryAdapter
+from parrot_rcc.adapter import ZeebeVariablesAdapter
+from parrot_rcc.worker import Worker
+from pyzeebe import create_insecure_channel
+from pyzeebe import Job
+from pyzeebe.task import task_builder
+from pyzeebe.task.task import Task
+from pyzeebe.task.task_config import TaskConfig
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+import asyncio
+import io
+
+
+class FakeS3Client:
+    """In-memory stand-in for the object methods of a boto3 S3 client."""
+
+    def __init__(self):
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, ContentType: str):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket: str, Key: str) -> Dict:
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict, ExpiresIn: int):
+        return f"https://s3/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 10):
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "Condition was not met in time"
+        await asyncio.sleep(0.05)
+
+
+def build_task(
+    task_type: str,
+    handler: Callable[..., Awaitable],
+    max_jobs: int = 10,
+    exception_handler: Optional[Callable[[Exception, Job], Awaitable]] = None,
+) -> Task:
+    async def execute(**kwargs):
+        await handler(**kwargs)
+        return {}
+
+    return task_builder.build_task(
+        execute,
+        TaskConfig(
+            type=task_type,
+            exception_handler=exception_handler,
+            timeout_ms=10000,
+            max_jobs_to_activate=max_jobs,
+            max_running_jobs=max_jobs,
+            variables_to_fetch=[],
+            single_value=False,
+            variable_name="",
+            before=[],
+            after=[],
+        ),
+    )
+
+
+def create_worker(gateway_port: int, name: str = "worker", **kwargs) -> Worker:
+    worker = Worker(
+        create_insecure_channel(hostname="127.0.0.1", port=gateway_port),
+        name=name,
+        request_timeout=1000,
+        poll_retry_delay=0.2,
+        **kwargs,
+    )
+    # Adapter is extended like in main, but only once per process
+    bases = worker.zeebe_adapter.__class__.__bases__
+    if ZeebeRetryAdapter not in bases:
+        worker.zeebe_adapter.__class__.__bases__ = (
+            (ZeebeRetryAdapter,) + bases + (ZeebeVariablesAdapter,)
+        )
+    return worker